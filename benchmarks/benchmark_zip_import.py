@@ -0,0 +1,130 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Compare the import latency of a zip-packaged package against the exploded layout.
+
+A synthetic package tree shaped like the ones generated by betterproto (deep
+hierarchies of small `__init__.py` files) is created, and the time needed to import
+all of it in a fresh interpreter is measured for both layouts:
+
+* exploded: the files in a directory, with the bytecode cached in `__pycache__`.
+* zipped: the files packed with `zip_output`, with the bytecode inside the archive.
+
+The gains depend heavily on the filesystem: on a local disk with a warm cache the
+difference is small (and zipimport may even be slightly slower), the zipped layout
+shines when each `stat()`/`open()` is expensive, like on network filesystems or
+when extracting or installing the files.
+
+Usage:
+    python benchmarks/benchmark_zip_import.py [--packages N] [--depth D] [--runs R]
+"""
+
+import argparse
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from setuptools_betterproto._zip import pack_files
+
+_MODULE_TEMPLATE = '''\
+from dataclasses import dataclass
+
+import typing
+
+
+@dataclass(eq=False, repr=False)
+class Message{index}:
+    """A message."""
+
+    field_a: int = 0
+    field_b: str = ""
+    field_c: typing.List[int] | None = None
+'''
+
+
+def _create_tree(root: str, packages: int, depth: int) -> list[str]:
+    files: list[str] = []
+    for index in range(packages):
+        parts = ["bench_pkg", *(f"level{level}" for level in range(depth)), f"p{index}"]
+        for level in range(1, len(parts) + 1):
+            path = os.path.join(root, *parts[:level], "__init__.py")
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(_MODULE_TEMPLATE.format(index=index))
+            files.append(path)
+    return files
+
+
+def _tree_size(root: str) -> tuple[int, int]:
+    """Count the files and the total size of a directory tree."""
+    sizes = [
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _, names in os.walk(root)
+        for name in names
+    ]
+    return len(sizes), sum(sizes)
+
+
+def _import_time(path: str, modules: list[str], runs: int) -> float:
+    """Measure the median time to import all the modules in a new interpreter."""
+    code = (
+        "import importlib, time\n"
+        "start = time.perf_counter()\n"
+        f"for module in {modules!r}:\n"
+        "    importlib.import_module(module)\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    times = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code],
+                env=dict(os.environ, PYTHONPATH=path),
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(runs)
+    ]
+    return statistics.median(times)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packages", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        exploded = os.path.join(tmp_dir, "exploded")
+        archive = os.path.join(tmp_dir, "generated.zip")
+        files = _create_tree(exploded, args.packages, args.depth)
+        modules = [
+            os.path.relpath(os.path.dirname(f), exploded).replace(os.sep, ".")
+            for f in files
+        ]
+
+        compileall.compile_dir(exploded, quiet=1)
+        result = pack_files(files, exploded, archive)
+
+        exploded_files, exploded_bytes = _tree_size(exploded)
+        exploded_time = _import_time(exploded, modules, args.runs)
+        zipped_time = _import_time(archive, modules, args.runs)
+
+    print(f"modules:  {result.files}")
+    print(f"files:    {exploded_files} (exploded, with bytecode) -> 1 (zip)")
+    print(f"size:     {exploded_bytes} bytes (exploded) -> {result.bytes_after} (zip)")
+    print(f"exploded: {exploded_time * 1000:.1f} ms")
+    print(f"zipped:   {zipped_time * 1000:.1f} ms")
+    print(f"speedup:  {exploded_time / zipped_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,16 @@
 """A modern setuptools plugin to generate Python files from proto files using betterproto."""
 
 from ._command import AddProtoFiles, CompileBetterproto
+from ._compile import CompileResult, compile_protos, compile_protos_async
 from ._config import ProtobufConfig
 from ._install import finalize_distribution_options
 
 __all__ = [
     "AddProtoFiles",
     "CompileBetterproto",
+    "CompileResult",
     "ProtobufConfig",
+    "compile_protos",
+    "compile_protos_async",
     "finalize_distribution_options",
 ]
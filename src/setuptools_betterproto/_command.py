@@ -11,17 +11,18 @@ the `sdist` command is also provided. This command will copy the proto files to
 source distribution before building it.
 """
 
+import dataclasses
 import logging
 import os
 import shutil
-import subprocess
-import sys
+import typing
 
 import setuptools
+import setuptools.command.build_py
 import setuptools.command.sdist
 from typing_extensions import override
 
-from . import _config
+from . import _compile, _config, _manifest
 
 _logger = logging.getLogger(__name__)
 
@@ -41,6 +42,15 @@ class BaseProtoCommand(setuptools.Command):
     out_path: str
     """The path of the root directory where the Python files will be generated."""
 
+    slim: bool
+    """Whether to strip docstrings, comments and repeated imports from generated files."""
+
+    zip_output: str
+    """The path of a zip archive to pack the generated files into, or empty to disable."""
+
+    sdist_generated: bool
+    """Whether to include the generated files in the source distribution."""
+
     config: _config.ProtobufConfig
     """The configuration object for the command."""
 
@@ -64,9 +74,28 @@ class BaseProtoCommand(setuptools.Command):
             None,
             "path of the root directory where the Python files will be generated",
         ),
+        (
+            "slim",
+            None,
+            "strip docstrings, comments and repeated imports from the generated files",
+        ),
+        (
+            "zip-output=",
+            None,
+            "path of a zip archive (relative to the out-dir) to pack the generated "
+            "files into",
+        ),
+        (
+            "sdist-generated",
+            None,
+            "include the generated files in the source distribution",
+        ),
     ]
     """Options of the command."""
 
+    boolean_options: list[str] = ["slim", "sdist-generated"]
+    """Options of the command that are flags."""
+
     @override
     def initialize_options(self) -> None:
         """Initialize options with default values."""
@@ -76,6 +105,9 @@ class BaseProtoCommand(setuptools.Command):
         self.proto_glob = self.config.proto_glob
         self.include_paths = ",".join(self.config.include_paths)
         self.out_path = self.config.out_path
+        self.slim = self.config.slim
+        self.zip_output = self.config.zip_output
+        self.sdist_generated = self.config.sdist_generated
 
     @override
     def finalize_options(self) -> None:
@@ -85,42 +117,261 @@ class BaseProtoCommand(setuptools.Command):
             proto_glob=self.proto_glob,
             include_paths=self.include_paths,
             out_path=self.out_path,
+            slim=bool(self.slim),
+            zip_output=self.zip_output,
+            sdist_generated=bool(self.sdist_generated),
         )
 
 
 class CompileBetterproto(BaseProtoCommand):
-    """A command to compile the protobuf files."""
+    """A command to compile the protobuf files.
+
+    This command implements the `setuptools.command.build.SubCommand` protocol, so
+    setuptools knows which files are used as inputs and which files are generated
+    (for example for editable installs).
+
+    The generated files are always written in place (to the `out_path`). When not
+    in editable mode, they are also copied to the `build_lib` directory, as they
+    might not be found by the package discovery (which runs before they are
+    generated).
+
+    If `zip_output` is enabled, the archive is copied to the root of `build_lib`,
+    together with a `.pth` file that adds it to `sys.path` when installed. In
+    editable mode `zip_output` is ignored, and the generated files are written in
+    place as usual, so they are importable from the project directory.
+    """
+
+    editable_mode: bool = False
+    """Whether the command is run for an editable installation."""
+
+    build_lib: str | None
+    """The directory where the build artifacts are stored.
+
+    If `None`, the one from the `build_py` command is used.
+    """
+
+    build_base: str | None
+    """The base directory for the build, where the manifest is stored.
+
+    If `None`, the one from the `build` command is used.
+    """
 
     @override
-    def run(self) -> None:
-        """Compile the protobuf files to Python."""
-        proto_files = self.config.expanded_proto_files
+    def initialize_options(self) -> None:
+        """Initialize options with default values."""
+        super().initialize_options()
+        self.build_lib = None
+        self.build_base = None
 
-        if not proto_files:
-            _logger.warning(
-                "No proto files were found in the `proto_path` (%s) using `proto_glob` "
-                "(%s). You probably want to check if you `proto_path` and `proto_glob` "
-                "are configured correctly. We are not compiling any proto files!",
-                self.config.proto_path,
-                self.config.proto_glob,
-            )
+    @override
+    def finalize_options(self) -> None:
+        """Finalize options, taking the build directories from the `build` command."""
+        super().finalize_options()
+        self.set_undefined_options("build", ("build_base", "build_base"))
+
+    @override
+    def run(self) -> None:
+        """Compile the protobuf files to Python and copy them to `build_lib`."""
+        config = self.build_config
+        if config.zip_output != self.config.zip_output:
+            _logger.info("`zip_output` is ignored in editable mode")
+        _compile.compile_protos(config, manifest_dir=self.manifest_dir)
+        if self.editable_mode:
             return
 
-        protoc_cmd = [
-            sys.executable,
-            "-m",
-            "grpc_tools.protoc",
-            *(f"-I{p}" for p in [self.config.proto_path, *self.config.include_paths]),
-            f"--python_betterproto_out={self.config.out_path}",
-            *proto_files,
+        for dest, source in self.get_output_mapping().items():
+            self.mkpath(os.path.dirname(dest))
+            self.copy_file(source, dest, preserve_mode=False)
+
+        pth_file = self._get_pth_file()
+        if pth_file is not None:
+            _logger.info("writing %s", pth_file)
+            with open(pth_file, "w", encoding="utf-8") as pth:
+                pth.write(os.path.basename(config.zip_output) + "\n")
+
+    @property
+    def build_config(self) -> _config.ProtobufConfig:
+        """The configuration used to build, `zip_output` is disabled in editable mode."""
+        if self.editable_mode and self.config.zip_output:
+            return dataclasses.replace(self.config, zip_output="")
+        return self.config
+
+    @property
+    def manifest_dir(self) -> str:
+        """The directory where the manifest of the generated files is stored.
+
+        See `get_manifest_dir()` for details.
+        """
+        build_base = self.build_base
+        if build_base is None:
+            build_base = self.get_finalized_command("build").build_base
+        return get_manifest_dir(self.config, build_base)
+
+    def get_source_files(self) -> list[str]:
+        """Get the files used as inputs to generate the Python files.
+
+        Returns:
+            The proto files, including the ones in the `include_paths`.
+        """
+        return [
+            *self.config.expanded_proto_files,
+            *self.config.expanded_include_files,
         ]
 
-        _logger.info("compiling proto files via: %s", " ".join(protoc_cmd))
-        subprocess.run(protoc_cmd, check=True)
+    def get_outputs(self) -> list[str]:
+        """Get the generated files, as they are copied to the `build_lib` directory.
+
+        Returns:
+            The generated files in the `build_lib` directory, including the `.pth`
+                file if `zip_output` is enabled.
+        """
+        outputs = list(self.get_output_mapping())
+        pth_file = self._get_pth_file()
+        if pth_file is not None:
+            outputs.append(pth_file)
+        return outputs
+
+    def get_output_mapping(self) -> dict[str, str]:
+        """Get the mapping from the generated files in `build_lib` to the sources.
+
+        The generated files are known from the manifest written when the proto files
+        were last compiled, so this doesn't need to compile or scan for the files. If
+        there is no manifest (the files were never compiled), the mapping is empty.
+
+        The package of each generated file is resolved using the package directories
+        of the `build_py` command (the `package_dir` option), the same way `build_py`
+        maps packages to directories. Files that are not in any package directory
+        are skipped.
+
+        If `zip_output` is enabled, the archive is mapped to the root of `build_lib`
+        instead, as the packages in it are top-level packages.
+
+        Returns:
+            The mapping from the generated files in `build_lib` (keys) to the
+                generated files in the `out_path` (values).
+        """
+        config = self.build_config
+        manifest = _manifest.GeneratedManifest.load(self.manifest_dir)
+        if manifest is None:
+            return {}
+
+        build_lib = self._get_build_lib()
+        if config.zip_output:
+            return {
+                os.path.join(build_lib, os.path.basename(source)): source
+                for source in manifest.generated_paths(config.out_path)
+            }
+
+        build_py = self._get_build_py()
+
+        mapping: dict[str, str] = {}
+        for source in manifest.generated_paths(config.out_path):
+            package = _find_package(build_py, os.path.dirname(source))
+            if package is None:
+                _logger.warning(
+                    "WARNING: The generated file %s is not in any package directory "
+                    "(see the `package_dir` option), it will not be included in the "
+                    "build!",
+                    source,
+                )
+                continue
+            dest = os.path.join(
+                build_lib, *filter(None, package.split(".")), os.path.basename(source)
+            )
+            mapping[dest] = source
+        return mapping
+
+    def _get_build_py(self) -> setuptools.command.build_py.build_py:
+        return typing.cast(
+            setuptools.command.build_py.build_py,
+            self.get_finalized_command("build_py"),
+        )
+
+    def _get_build_lib(self) -> str:
+        if self.build_lib is not None:
+            return self.build_lib
+        return self._get_build_py().build_lib
+
+    def _get_pth_file(self) -> str | None:
+        """Get the path of the `.pth` file in `build_lib`, if `zip_output` is enabled.
+
+        The `.pth` file is named like the archive, and adds it to `sys.path` when
+        installed in a `site-packages` directory.
+        """
+        zip_output = self.build_config.zip_output
+        if not zip_output:
+            return None
+        name, _ = os.path.splitext(os.path.basename(zip_output))
+        return os.path.join(self._get_build_lib(), name + ".pth")
+
+
+def get_manifest_dir(config: _config.ProtobufConfig, build_base: str) -> str:
+    """Get the directory where the manifest of the generated files is stored.
+
+    If the generated files are included in the source distribution, the manifest is
+    stored in the `out_path`, so it is shipped with them. Otherwise it is stored in
+    the build directory, so no extra files are left in the project.
+
+    Args:
+        config: The configuration used to generate the files.
+        build_base: The base directory for the build.
+
+    Returns:
+        The directory where the manifest is stored.
+    """
+    if config.sdist_generated:
+        return config.out_path
+    return os.path.join(build_base, "setuptools_betterproto")
+
+
+def _find_package(
+    build_py: setuptools.command.build_py.build_py, directory: str
+) -> str | None:
+    """Find the package that `build_py` maps to a directory.
+
+    This is the inverse of `build_py.get_package_dir()`: the most specific entry in
+    the `package_dir` option that contains the directory is used.
+
+    Args:
+        build_py: The finalized `build_py` command.
+        directory: The directory to find the package for.
+
+    Returns:
+        The name of the package (an empty string for the root package), or `None`
+            if the directory is not in any package directory.
+    """
+    directory = os.path.abspath(directory)
+    best: tuple[int, str] | None = None
+    for root_package in {"", *(build_py.package_dir or {})}:
+        root_dir = os.path.abspath(build_py.get_package_dir(root_package) or ".")
+        try:
+            relative = os.path.relpath(directory, root_dir)
+        except ValueError:  # On Windows, if they are on different drives
+            continue
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            continue
+        parts = [] if relative == os.curdir else relative.split(os.sep)
+        if not all(part.isidentifier() for part in parts):
+            continue
+        package = ".".join(filter(None, [root_package, *parts]))
+        if best is None or len(root_dir) > best[0]:
+            best = (len(root_dir), package)
+
+    if best is None:
+        return None
+    package = best[1]
+    # Make sure build_py would look for the package in the same directory
+    if os.path.abspath(build_py.get_package_dir(package) or ".") != directory:
+        return None
+    return package
 
 
 class AddProtoFiles(BaseProtoCommand):
-    """A command to add the proto files to the source distribution."""
+    """A command to add the proto files to the source distribution.
+
+    If the `sdist_generated` option is enabled, the generated files and their
+    manifest are added too.
+    """
 
     def run(self) -> None:
         """Copy the proto files to the source distribution."""
@@ -152,6 +403,12 @@ class AddProtoFiles(BaseProtoCommand):
             )
             return
 
+        if self.config.sdist_generated:
+            # This must be done before copying anything to the source distribution
+            # directory, otherwise the compiler could find the copied proto files
+            # too (for example if the `proto_path` is the project root).
+            self.run_command("compile_betterproto")
+
         dest_dir = self.distribution.get_fullname()
 
         for file in (*proto_files, *include_files):
@@ -159,6 +416,35 @@ class AddProtoFiles(BaseProtoCommand):
 
         _logger.info("added %s proto files", len(proto_files) + len(include_files))
 
+        if self.config.sdist_generated:
+            self.add_generated_files(dest_dir)
+
+    def add_generated_files(self, dest_dir: str) -> None:
+        """Copy the generated files and their manifest to the source distribution.
+
+        The `compile_betterproto` command must have been run before.
+
+        Args:
+            dest_dir: The directory where the source distribution is being built.
+        """
+        out_path = self.config.out_path
+        manifest = _manifest.GeneratedManifest.load(out_path)
+        if manifest is None:
+            _logger.warning(
+                "No manifest of generated files was found in %s, we are not adding "
+                "the generated files to the source distribution!",
+                out_path,
+            )
+            return
+
+        for file in (
+            _manifest.manifest_path(out_path),
+            *manifest.generated_paths(out_path),
+        ):
+            self.copy_with_directories(file, os.path.join(dest_dir, file))
+
+        _logger.info("added %s generated files", len(manifest.files))
+
     def copy_with_directories(self, src: str, dest: str) -> None:
         """Copy a file from src to dest, creating the destination's directory tree.
 
@@ -172,7 +458,7 @@ class AddProtoFiles(BaseProtoCommand):
         if not os.path.exists(dest_dir):
             _logger.debug("creating directory %s", dest_dir)
             os.makedirs(dest_dir)
-        _logger.info("adding proto file to %s", dest)
+        _logger.info("adding file to %s", dest)
         shutil.copyfile(src, dest)
 
 
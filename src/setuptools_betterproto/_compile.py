@@ -0,0 +1,420 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Compilation of protobuf files to Python, independent of setuptools.
+
+This module contains the functions used to compile the protobuf files, which can be
+used directly (without a setuptools `Distribution`), for example by build
+orchestrators that compile many projects at once.
+
+There is a synchronous version, `compile_protos()`, and an asynchronous version,
+`compile_protos_async()`, that runs the compiler as an asyncio subprocess and can be
+cancelled and limited in concurrency.
+
+Note:
+    Relative paths in the configuration are resolved relative to the current
+    working directory. When compiling several projects concurrently, use
+    `ProtobufConfig.with_root()` to make the paths relative to each project root.
+"""
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import logging
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import _config, _manifest, _slim, _zip
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class CompileResult:
+    """The result of compiling the protobuf files."""
+
+    config: _config.ProtobufConfig
+    """The configuration used to compile the files."""
+
+    files: tuple[str, ...] = ()
+    """The paths of the generated files, including the `out_path`.
+
+    If `zip_output` is enabled, this is only the zip archive.
+    """
+
+    cache_hit: bool = False
+    """Whether the compilation was skipped because the generated files are up to date.
+
+    This is the case when the fingerprint of the inputs matches the one stored in the
+    manifest written by the last compilation, and all the generated files exist. It
+    is never the case if no manifest is used.
+    """
+
+    protoc_time: float = 0.0
+    """The time spent running the protobuf compiler, in seconds."""
+
+    total_time: float = 0.0
+    """The total time spent, in seconds."""
+
+    slim: _slim.SlimResult | None = None
+    """The result of slimming the generated files, if the `slim` option is enabled.
+
+    The import times are only measured if debug logging is enabled for this module.
+    """
+
+    zip: _zip.ZipResult | None = None
+    """The result of packing the generated files, if `zip_output` is enabled."""
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class _Prepared:
+    """The state collected before running the protobuf compiler."""
+
+    start: float
+    """The time the compilation started (as returned by `time.perf_counter()`)."""
+
+    command: list[str]
+    """The protobuf compiler command to run."""
+
+    fingerprint: str
+    """The fingerprint of the inputs."""
+
+    manifest_dir: str | None
+    """The directory where the manifest is stored, if any."""
+
+    tmp_dir: str
+    """The temporary directory where the protobuf compiler writes the files."""
+
+
+def protoc_command(
+    config: _config.ProtobufConfig, out_path: str | None = None
+) -> list[str]:
+    """Get the command to run the protobuf compiler.
+
+    Args:
+        config: The configuration to use.
+        out_path: The directory where the files should be generated. If `None`,
+            the `out_path` of the configuration is used.
+
+    Returns:
+        The command to run the protobuf compiler, as a list of arguments.
+    """
+    if out_path is None:
+        out_path = config.out_path
+    return [
+        sys.executable,
+        "-m",
+        "grpc_tools.protoc",
+        *(f"-I{p}" for p in [config.proto_path, *config.include_paths]),
+        f"--python_betterproto_out={out_path}",
+        *config.expanded_proto_files,
+    ]
+
+
+def compile_protos(
+    config: _config.ProtobufConfig,
+    *,
+    manifest_dir: str | None = None,
+    executor: concurrent.futures.Executor | None = None,
+) -> CompileResult:
+    """Compile the protobuf files to Python.
+
+    Args:
+        config: The configuration to use.
+        manifest_dir: The directory where the manifest of the generated files is
+            stored, used to skip the compilation if the generated files are up to
+            date. If `None`, the `out_path` is used when the `sdist_generated`
+            option is enabled, otherwise no manifest is used and the files are
+            always compiled.
+        executor: The executor used to slim the generated files in parallel, if the
+            `slim` option is enabled. If `None`, the files are slimmed in the
+            calling process.
+
+    Returns:
+        The result of the compilation.
+
+    Raises:
+        subprocess.CalledProcessError: If the protobuf compiler fails.
+    """
+    prepared = _prepare(config, manifest_dir)
+    if isinstance(prepared, CompileResult):
+        return prepared
+
+    try:
+        _logger.info("compiling proto files via: %s", " ".join(prepared.command))
+        protoc_start = time.perf_counter()
+        subprocess.run(prepared.command, check=True)
+        protoc_time = time.perf_counter() - protoc_start
+
+        return _finish(config, prepared, protoc_time, executor)
+    finally:
+        shutil.rmtree(prepared.tmp_dir, ignore_errors=True)
+
+
+async def compile_protos_async(
+    config: _config.ProtobufConfig,
+    *,
+    semaphore: asyncio.Semaphore | None = None,
+    manifest_dir: str | None = None,
+    executor: concurrent.futures.Executor | None = None,
+) -> CompileResult:
+    """Compile the protobuf files to Python asynchronously.
+
+    The protobuf compiler is run as an asyncio subprocess, and the blocking parts
+    (like finding and slimming the generated files) are run in a thread.
+
+    If the task is cancelled while the compiler is running, the compiler process is
+    killed before the cancellation is propagated. If it is cancelled while the
+    generated files are being processed, the processing thread is allowed to
+    finish first, so the generated files and the manifest are left consistent.
+
+    Example:
+        ```python
+        import asyncio
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        from setuptools_betterproto import ProtobufConfig, compile_protos_async
+
+        async def compile_all(roots: list[str]) -> None:
+            semaphore = asyncio.Semaphore(4)
+            with ProcessPoolExecutor(
+                mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results = await asyncio.gather(
+                    *(
+                        compile_protos_async(
+                            ProtobufConfig.from_pyproject_toml(
+                                f"{root}/pyproject.toml"
+                            ).with_root(root),
+                            semaphore=semaphore,
+                            executor=executor,
+                        )
+                        for root in roots
+                    )
+                )
+            for result in results:
+                print(len(result.files), result.cache_hit, result.total_time)
+        ```
+
+    Args:
+        config: The configuration to use.
+        semaphore: A semaphore to limit the number of compilations running
+            concurrently. The semaphore is held for the whole compilation.
+        manifest_dir: The directory where the manifest of the generated files is
+            stored, used to skip the compilation if the generated files are up to
+            date. If `None`, the `out_path` is used when the `sdist_generated`
+            option is enabled, otherwise no manifest is used and the files are
+            always compiled.
+        executor: The executor used to slim the generated files in parallel, if the
+            `slim` option is enabled. Sharing one executor between concurrent
+            compilations limits the total number of workers. If `None`, the files
+            are slimmed in the thread processing the generated files.
+
+    Returns:
+        The result of the compilation.
+
+    Raises:
+        subprocess.CalledProcessError: If the protobuf compiler fails.
+    """
+    if semaphore is None:
+        return await _compile_protos_async(config, manifest_dir, executor)
+    async with semaphore:
+        return await _compile_protos_async(config, manifest_dir, executor)
+
+
+async def _compile_protos_async(
+    config: _config.ProtobufConfig,
+    manifest_dir: str | None,
+    executor: concurrent.futures.Executor | None,
+) -> CompileResult:
+    prepared = await asyncio.to_thread(_prepare, config, manifest_dir)
+    if isinstance(prepared, CompileResult):
+        return prepared
+
+    try:
+        _logger.info("compiling proto files via: %s", " ".join(prepared.command))
+        protoc_start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(*prepared.command)
+        try:
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await asyncio.shield(process.wait())
+            raise
+        protoc_time = time.perf_counter() - protoc_start
+
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, prepared.command)
+
+        finishing = asyncio.ensure_future(
+            asyncio.to_thread(_finish, config, prepared, protoc_time, executor)
+        )
+        try:
+            return await asyncio.shield(finishing)
+        except asyncio.CancelledError:
+            # The thread can't be interrupted, so wait until it is done with the
+            # temporary directory before removing it
+            await asyncio.wait([finishing])
+            raise
+    finally:
+        shutil.rmtree(prepared.tmp_dir, ignore_errors=True)
+
+
+def _prepare(
+    config: _config.ProtobufConfig, manifest_dir: str | None
+) -> _Prepared | CompileResult:
+    """Prepare the compilation.
+
+    Args:
+        config: The configuration to use.
+        manifest_dir: The directory where the manifest is stored, if any.
+
+    Returns:
+        The state needed to finish the compilation, or the final result if no
+            compilation is needed.
+    """
+    start = time.perf_counter()
+
+    if not config.expanded_proto_files:
+        _logger.warning(
+            "No proto files were found in the `proto_path` (%s) using `proto_glob` "
+            "(%s). You probably want to check if you `proto_path` and `proto_glob` "
+            "are configured correctly. We are not compiling any proto files!",
+            config.proto_path,
+            config.proto_glob,
+        )
+        return CompileResult(config=config, total_time=time.perf_counter() - start)
+
+    if manifest_dir is None and config.sdist_generated:
+        manifest_dir = config.out_path
+
+    fingerprint = _manifest.compute_fingerprint(config)
+    manifest = (
+        None if manifest_dir is None else _manifest.GeneratedManifest.load(manifest_dir)
+    )
+    if manifest is not None and manifest.is_up_to_date(config, fingerprint=fingerprint):
+        _logger.info(
+            "the generated files in %s are up to date with the proto files "
+            "(fingerprint matches), skipping compilation",
+            config.out_path,
+        )
+        return CompileResult(
+            config=config,
+            files=tuple(manifest.generated_paths(config.out_path)),
+            cache_hit=True,
+            total_time=time.perf_counter() - start,
+        )
+
+    # The files are generated in a temporary directory first, so we know exactly
+    # which files were generated, and they are only moved to the `out_path` once
+    # they are completely processed.
+    tmp_dir = tempfile.mkdtemp(prefix="setuptools_betterproto-")
+    return _Prepared(
+        start=start,
+        command=protoc_command(config, tmp_dir),
+        fingerprint=fingerprint,
+        manifest_dir=manifest_dir,
+        tmp_dir=tmp_dir,
+    )
+
+
+def _finish(
+    config: _config.ProtobufConfig,
+    prepared: _Prepared,
+    protoc_time: float,
+    executor: concurrent.futures.Executor | None,
+) -> CompileResult:
+    """Post-process the generated files after the protobuf compiler ran.
+
+    Args:
+        config: The configuration to use.
+        prepared: The state collected before running the protobuf compiler.
+        protoc_time: The time spent running the protobuf compiler, in seconds.
+        executor: The executor used to slim the generated files.
+
+    Returns:
+        The result of the compilation.
+    """
+    tmp_files = sorted(
+        os.path.join(root, file)
+        for root, _, files in os.walk(prepared.tmp_dir)
+        for file in files
+    )
+
+    slim_result = None
+    if config.slim:
+        # Measuring the import time runs a few extra interpreters, so it is only
+        # done when it is going to be logged
+        measure_import_time = _logger.isEnabledFor(logging.DEBUG)
+        slim_result = _slim.slim_files(
+            tmp_files,
+            import_root=prepared.tmp_dir if measure_import_time else None,
+            executor=executor,
+        )
+        _logger.info(
+            "slimmed %s generated files: %s bytes saved (%s -> %s)",
+            slim_result.files,
+            slim_result.bytes_saved,
+            slim_result.bytes_before,
+            slim_result.bytes_after,
+        )
+        if measure_import_time:
+            import_time_saved = slim_result.import_time_saved
+            _logger.debug(
+                "import time saved by slimming: %s",
+                (
+                    "unknown"
+                    if import_time_saved is None
+                    else f"{import_time_saved * 1000:.1f} ms"
+                ),
+            )
+
+    zip_result = None
+    if config.zip_output:
+        zip_result = _zip.pack_files(
+            tmp_files,
+            prepared.tmp_dir,
+            os.path.join(config.out_path, config.zip_output),
+        )
+        generated = [zip_result.archive]
+        _logger.info(
+            "packed %s generated files into %s (%s -> %s bytes)",
+            zip_result.files,
+            zip_result.archive,
+            zip_result.bytes_before,
+            zip_result.bytes_after,
+        )
+    else:
+        generated = []
+        for tmp_file in tmp_files:
+            dest = os.path.join(
+                config.out_path, os.path.relpath(tmp_file, prepared.tmp_dir)
+            )
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.move(tmp_file, dest)
+            generated.append(dest)
+
+    if prepared.manifest_dir is not None:
+        _manifest.GeneratedManifest(
+            fingerprint=prepared.fingerprint,
+            files=tuple(
+                pathlib.Path(path).relative_to(config.out_path).as_posix()
+                for path in generated
+            ),
+        ).save(prepared.manifest_dir)
+
+    return CompileResult(
+        config=config,
+        files=tuple(generated),
+        protoc_time=protoc_time,
+        total_time=time.perf_counter() - prepared.start,
+        slim=slim_result,
+        zip=zip_result,
+    )
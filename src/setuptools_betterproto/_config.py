@@ -5,6 +5,7 @@
 
 import dataclasses
 import logging
+import os
 import pathlib
 import sys
 from collections.abc import Sequence
@@ -40,6 +41,24 @@ class ProtobufConfig:
     out_path: str = "."
     """The path of the root directory where the Python files will be generated."""
 
+    slim: bool = False
+    """Whether to strip docstrings, comments and repeated imports from generated files."""
+
+    zip_output: str = ""
+    """The path of a zip archive to pack the generated files into, or empty to disable.
+
+    The path is relative to the `out_path`. The archive can be imported by adding it
+    to `sys.path`. Wheels install it with a `.pth` file that does this. It is ignored
+    in editable installs.
+    """
+
+    sdist_generated: bool = False
+    """Whether to include the generated files in the source distribution.
+
+    A fingerprint of the inputs is included too, so building a wheel from the source
+    distribution can skip the compilation if the proto files were not changed.
+    """
+
     @classmethod
     def from_pyproject_toml(
         cls, path: str = "pyproject.toml", /, **defaults: Any
@@ -85,8 +104,16 @@ class ProtobufConfig:
         return dataclasses.replace(default, **attrs)
 
     @classmethod
-    def from_strings(
-        cls, *, proto_path: str, proto_glob: str, include_paths: str, out_path: str
+    def from_strings(  # pylint: disable=too-many-arguments
+        cls,
+        *,
+        proto_path: str,
+        proto_glob: str,
+        include_paths: str,
+        out_path: str,
+        slim: bool = False,
+        zip_output: str = "",
+        sdist_generated: bool = False,
     ) -> Self:
         """Create a new configuration from plain strings.
 
@@ -97,6 +124,12 @@ class ProtobufConfig:
                 protobuf files.
             out_path: The path of the root directory where the Python files will be
                 generated.
+            slim: Whether to strip docstrings, comments and repeated imports from the
+                generated files.
+            zip_output: The path of a zip archive to pack the generated files into,
+                relative to the `out_path`, or empty to disable it.
+            sdist_generated: Whether to include the generated files in the source
+                distribution.
 
         Returns:
             The configuration.
@@ -106,6 +139,28 @@ class ProtobufConfig:
             proto_glob=proto_glob,
             include_paths=[p.strip() for p in filter(None, include_paths.split(","))],
             out_path=out_path,
+            slim=slim,
+            zip_output=zip_output,
+            sdist_generated=sdist_generated,
+        )
+
+    def with_root(self, root: str) -> Self:
+        """Create a new configuration with all the paths relative to a root directory.
+
+        This is useful to compile the protobuf files of a project without changing
+        the current working directory to the project root.
+
+        Args:
+            root: The root directory the paths should be relative to.
+
+        Returns:
+            The new configuration.
+        """
+        return dataclasses.replace(
+            self,
+            proto_path=os.path.join(root, self.proto_path),
+            include_paths=[os.path.join(root, p) for p in self.include_paths],
+            out_path=os.path.join(root, self.out_path),
         )
 
     @property
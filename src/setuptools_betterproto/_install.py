@@ -21,7 +21,7 @@ from collections.abc import Container
 import setuptools.command.build as _build_command
 from setuptools.dist import Distribution
 
-from . import _command, _config
+from . import _command, _compile, _config
 
 _logger = logging.getLogger(__name__)
 
@@ -55,14 +55,23 @@ def finalize_distribution_options(dist: Distribution) -> None:
         )
         return
 
-    build_proto(dist)
+    build_proto(config, build_base=get_build_base(dist))
 
 
 def add_build_subcommand_compile_betterproto(dist: Distribution) -> None:
-    """Add the compile_betterproto command to the build sub-commands."""
-    sdist_cmd = dist.get_command_obj("build")
-    assert isinstance(sdist_cmd, _build_command.build)
-    sdist_cmd.sub_commands.append(("compile_betterproto", None))
+    """Add the compile_betterproto command to the build sub-commands.
+
+    The command is added before `build_py`, so the files generated in place are
+    up to date when `build_py` copies them to the build directory. If the command
+    was already added, nothing is done.
+    """
+    build_cmd = dist.get_command_obj("build")
+    assert isinstance(build_cmd, _build_command.build)
+    names = [name for name, _ in build_cmd.sub_commands]
+    if "compile_betterproto" in names:
+        return
+    index = names.index("build_py") if "build_py" in names else len(names)
+    build_cmd.sub_commands.insert(index, ("compile_betterproto", None))
 
 
 def replace_sdist_command(dist: Distribution) -> None:
@@ -80,12 +89,42 @@ def building_bdist(dist: Distribution) -> bool:
     return False
 
 
-def build_proto(dist: Distribution) -> None:
-    """Build the Python protobuf files."""
+def get_build_base(dist: Distribution) -> str:
+    """Get the base build directory, as far as it is known this early.
+
+    Only the `build_base` given via the `options` argument of `setup()` is known
+    when the distribution options are finalized, as the configuration files and the
+    command line are parsed later. If it is set there instead, the early
+    compilation doesn't find the manifest and the files are compiled again by the
+    `compile_betterproto` build sub-command.
+
+    Args:
+        dist: The distribution object.
+
+    Returns:
+        The base build directory.
+    """
+    _, build_base = dist.get_option_dict("build").get(
+        "build_base", ("default", "build")
+    )
+    return str(build_base)
+
+
+def build_proto(config: _config.ProtobufConfig, *, build_base: str = "build") -> None:
+    """Build the Python protobuf files.
+
+    The files are compiled directly instead of running the `compile_betterproto`
+    command, as the other commands (and their options) can't be finalized this
+    early. The manifest is stored in the build directory, so the
+    `compile_betterproto` build sub-command can skip the compilation later.
+
+    Args:
+        config: The configuration to use.
+        build_base: The base build directory (see `get_build_base()`).
+    """
     _logger.info(
         "Compiling protobuf files early so they are included in the binary distribution."
     )
-    compile_cmg = _command.CompileBetterproto(dist)
-    compile_cmg.initialize_options()
-    compile_cmg.finalize_options()
-    compile_cmg.run()
+    _compile.compile_protos(
+        config, manifest_dir=_command.get_manifest_dir(config, build_base)
+    )
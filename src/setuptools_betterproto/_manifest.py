@@ -0,0 +1,185 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Tracking of generated files and the inputs they were generated from.
+
+A compilation can write a manifest file to a directory. The manifest contains a
+fingerprint of all the inputs used to generate the files (the proto files and the
+relevant configuration) and the list of generated files, so a later build can tell
+if the generated files are still up to date and skip the compilation completely,
+and setuptools can be told which files are generated without compiling them.
+
+When building with setuptools, the manifest is stored in the build directory, so no
+extra files are left in the project. When the generated Python files are shipped
+with the source distribution, the manifest is stored in the `out_path` instead, and
+shipped too.
+"""
+
+import dataclasses
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import pathlib
+
+from typing_extensions import Self
+
+from . import _config
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = ".setuptools_betterproto.json"
+"""The name of the manifest file, relative to the directory where it is stored."""
+
+_FORMAT_VERSION = 1
+"""The version of the manifest (and fingerprint) format."""
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class GeneratedManifest:
+    """A manifest of the files generated from the proto files."""
+
+    fingerprint: str
+    """The fingerprint of the inputs the files were generated from."""
+
+    files: tuple[str, ...] = ()
+    """The generated files, as POSIX paths relative to the `out_path`."""
+
+    @classmethod
+    def load(cls, directory: str) -> Self | None:
+        """Load the manifest from a directory.
+
+        Args:
+            directory: The directory where the manifest is stored.
+
+        Returns:
+            The manifest, or `None` if there is no manifest or it can't be read.
+        """
+        path = manifest_path(directory)
+        try:
+            with open(path, encoding="utf-8") as manifest_file:
+                data = json.load(manifest_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            _logger.warning("WARNING: Failed to load %s: %s", path, err)
+            return None
+
+        try:
+            if data["version"] != _FORMAT_VERSION:
+                raise ValueError(f"unknown version {data['version']!r}")
+            return cls(fingerprint=str(data["fingerprint"]), files=tuple(data["files"]))
+        except (KeyError, TypeError, ValueError) as err:
+            _logger.warning("WARNING: Ignoring invalid %s: %s", path, err)
+            return None
+
+    def save(self, directory: str) -> None:
+        """Save the manifest to a directory.
+
+        The directory is created if it doesn't exist.
+
+        Args:
+            directory: The directory where the manifest is stored.
+        """
+        data = {
+            "version": _FORMAT_VERSION,
+            "fingerprint": self.fingerprint,
+            "files": list(self.files),
+        }
+        os.makedirs(directory, exist_ok=True)
+        with open(manifest_path(directory), "w", encoding="utf-8") as manifest_file:
+            json.dump(data, manifest_file, indent=2)
+            manifest_file.write("\n")
+
+    def generated_paths(self, out_path: str) -> list[str]:
+        """Get the paths of the generated files.
+
+        Args:
+            out_path: The path of the root directory where the Python files are
+                generated.
+
+        Returns:
+            The paths of the generated files, including the `out_path`.
+        """
+        return [os.path.join(out_path, *file.split("/")) for file in self.files]
+
+    def is_up_to_date(
+        self, config: _config.ProtobufConfig, *, fingerprint: str | None = None
+    ) -> bool:
+        """Check if the generated files are up to date with the inputs.
+
+        Args:
+            config: The configuration used to generate the files.
+            fingerprint: The fingerprint of the current inputs, if already
+                computed. If `None`, it is computed from the `config`.
+
+        Returns:
+            Whether the fingerprint matches the current inputs and all the generated
+                files exist.
+        """
+        if fingerprint is None:
+            fingerprint = compute_fingerprint(config)
+        return self.fingerprint == fingerprint and all(
+            os.path.isfile(path) for path in self.generated_paths(config.out_path)
+        )
+
+
+def manifest_path(directory: str) -> str:
+    """Get the path of the manifest file.
+
+    Args:
+        directory: The directory where the manifest is stored.
+
+    Returns:
+        The path of the manifest file.
+    """
+    return os.path.join(directory, MANIFEST_FILE_NAME)
+
+
+def compute_fingerprint(config: _config.ProtobufConfig) -> str:
+    """Compute a fingerprint of all the inputs used to generate the files.
+
+    The fingerprint covers the contents of all the proto files (including the ones
+    in the `include_paths`) and their paths relative to the `proto_path` or include
+    path they are in, the configuration options that affect the generated files and
+    the version of this plugin (which pins the betterproto version used).
+
+    Only relative paths are used, so the fingerprint doesn't depend on where the
+    project is located, how the paths are spelled (for example `proto` or
+    `./proto`), or where the files are generated.
+
+    Args:
+        config: The configuration used to generate the files.
+
+    Returns:
+        The fingerprint, as a hexadecimal string.
+    """
+    digest = hashlib.sha256()
+
+    def _update(*values: str | bytes) -> None:
+        for value in values:
+            data = value.encode("utf-8") if isinstance(value, str) else value
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+
+    _update(str(_FORMAT_VERSION), _plugin_version())
+    _update(str(config.slim), config.zip_output)
+    # The order of the roots matters, as it is the order used to resolve imports
+    for index, root in enumerate([config.proto_path, *config.include_paths]):
+        root_path = pathlib.Path(root)
+        files = {
+            path.relative_to(root_path).as_posix(): path
+            for path in root_path.rglob(config.proto_glob)
+        }
+        for relative in sorted(files):
+            _update(str(index), relative, files[relative].read_bytes())
+
+    return digest.hexdigest()
+
+
+def _plugin_version() -> str:
+    try:
+        return importlib.metadata.version("setuptools-betterproto")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
@@ -0,0 +1,328 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Post-generation transform to slim down the generated Python files.
+
+The code generated by betterproto carries all the proto comments as docstrings, plus
+some comments and boilerplate. This module provides a transform that removes all
+docstrings and comments (except the leading header comments) and deduplicates
+repeated top-level imports, without changing the behavior of the generated code
+(except for the `__doc__` attributes, which will be `None`).
+"""
+
+import ast
+import concurrent.futures
+import dataclasses
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from collections.abc import Iterable
+
+_logger = logging.getLogger(__name__)
+
+_IMPORT_TIME_RUNS = 3
+"""The number of times the import time is measured (the minimum is used)."""
+
+_IMPORT_TIME_SCRIPT = """\
+import importlib, sys, time
+try:
+    import betterproto
+except ImportError:
+    pass
+sys.pycache_prefix = sys.argv[1]
+start = time.perf_counter()
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+print(time.perf_counter() - start)
+"""
+"""The script used to measure the import time of the generated modules.
+
+The `betterproto` runtime is imported before starting the timer, so only the time
+needed to import the generated modules is measured. The bytecode of the generated
+modules is cached in the directory passed as the first argument, so it is not
+written next to them.
+"""
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class SlimResult:
+    """The result of slimming one or more files."""
+
+    files: int = 0
+    """The number of files that were slimmed."""
+
+    bytes_before: int = 0
+    """The total size of the files before slimming, in bytes."""
+
+    bytes_after: int = 0
+    """The total size of the files after slimming, in bytes."""
+
+    import_time_before: float | None = None
+    """The time needed to import the modules before slimming, in seconds.
+
+    This is measured in a subprocess with the bytecode already cached, like when
+    importing an installed wheel, so it is the time spent loading the bytecode and
+    executing the modules. It is `None` if it was not measured or the modules
+    couldn't be imported.
+    """
+
+    import_time_after: float | None = None
+    """The time needed to import the modules after slimming, in seconds.
+
+    See `import_time_before` for details.
+    """
+
+    @property
+    def bytes_saved(self) -> int:
+        """The number of bytes saved by slimming."""
+        return self.bytes_before - self.bytes_after
+
+    @property
+    def import_time_saved(self) -> float | None:
+        """The import time saved by slimming, in seconds, if it was measured."""
+        if self.import_time_before is None or self.import_time_after is None:
+            return None
+        return self.import_time_before - self.import_time_after
+
+    def __add__(self, other: "SlimResult") -> "SlimResult":
+        """Combine two results.
+
+        Args:
+            other: The other result to combine with this one.
+
+        Returns:
+            The combined result.
+        """
+        return SlimResult(
+            files=self.files + other.files,
+            bytes_before=self.bytes_before + other.bytes_before,
+            bytes_after=self.bytes_after + other.bytes_after,
+            import_time_before=_add_times(
+                self.import_time_before, other.import_time_before
+            ),
+            import_time_after=_add_times(
+                self.import_time_after, other.import_time_after
+            ),
+        )
+
+
+def _add_times(first: float | None, second: float | None) -> float | None:
+    """Add two optional times, the result is `None` if any of them is `None`."""
+    if first is None or second is None:
+        return None
+    return first + second
+
+
+class _DocstringRemover(ast.NodeTransformer):
+    """Remove all bare string expressions (docstrings) from the tree."""
+
+    @staticmethod
+    def _is_docstring(node: ast.stmt) -> bool:
+        return (
+            isinstance(node, ast.Expr)
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+        )
+
+    def _strip_body(self, node: ast.AST) -> ast.AST:
+        self.generic_visit(node)
+        for field in ("body", "orelse", "finalbody"):
+            body = getattr(node, field, None)
+            if not isinstance(body, list) or not body:
+                continue
+            stripped = [stmt for stmt in body if not self._is_docstring(stmt)]
+            # A body can't be empty (but `orelse` and `finalbody` can).
+            if not stripped and field == "body" and not isinstance(node, ast.Module):
+                stripped = [ast.Pass()]
+            setattr(node, field, stripped)
+        return node
+
+    visit_Module = _strip_body
+    visit_ClassDef = _strip_body
+    visit_FunctionDef = _strip_body
+    visit_AsyncFunctionDef = _strip_body
+    visit_If = _strip_body
+    visit_For = _strip_body
+    visit_AsyncFor = _strip_body
+    visit_While = _strip_body
+    visit_With = _strip_body
+    visit_AsyncWith = _strip_body
+    visit_Try = _strip_body
+    visit_ExceptHandler = _strip_body
+
+
+def _dedup_imports(module: ast.Module) -> None:
+    """Remove repeated top-level import statements from a module, in place."""
+    seen: set[str] = set()
+    body: list[ast.stmt] = []
+    for stmt in module.body:
+        if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            key = ast.dump(stmt)
+            if key in seen:
+                continue
+            seen.add(key)
+        body.append(stmt)
+    module.body = body
+
+
+def slim_source(source: str, filename: str = "<unknown>") -> str:
+    """Slim down the source code of a generated Python file.
+
+    Docstrings and comments are removed, and repeated top-level imports are
+    deduplicated. The leading comment block (with the "DO NOT EDIT" and
+    "@generated" markers) is kept.
+
+    Args:
+        source: The source code to slim down.
+        filename: The name of the file, used only for error messages.
+
+    Returns:
+        The slimmed down source code.
+    """
+    module = ast.parse(source, filename)
+    module = _DocstringRemover().visit(module)
+    assert isinstance(module, ast.Module)
+    _dedup_imports(module)
+    code = ast.unparse(ast.fix_missing_locations(module))
+    return _header(source) + (code + "\n" if code else "")
+
+
+def _header(source: str) -> str:
+    """Get the leading comment block of a source file, without trailing blank lines."""
+    header: list[str] = []
+    for line in source.splitlines(keepends=True):
+        if line.strip() and not line.lstrip().startswith("#"):
+            break
+        header.append(line)
+    while header and not header[-1].strip():
+        header.pop()
+    if header and not header[-1].endswith("\n"):
+        header[-1] += "\n"
+    return "".join(header)
+
+
+def slim_file(path: str) -> SlimResult:
+    """Slim down a generated Python file in place.
+
+    Args:
+        path: The path of the file to slim down.
+
+    Returns:
+        The result of slimming the file.
+    """
+    with open(path, encoding="utf-8") as source_file:
+        source = source_file.read()
+
+    slimmed = slim_source(source, path)
+
+    with open(path, "w", encoding="utf-8") as source_file:
+        source_file.write(slimmed)
+
+    return SlimResult(
+        files=1,
+        bytes_before=len(source.encode("utf-8")),
+        bytes_after=len(slimmed.encode("utf-8")),
+    )
+
+
+def slim_files(
+    paths: Iterable[str],
+    *,
+    import_root: str | None = None,
+    executor: concurrent.futures.Executor | None = None,
+) -> SlimResult:
+    """Slim down generated Python files in place.
+
+    If no `executor` is given, the files are slimmed in the calling process. No
+    process pool is created by default, as starting worker processes re-imports the
+    main module, which breaks builds from a `setup.py` without an
+    `if __name__ == "__main__":` guard.
+
+    Args:
+        paths: The paths of the files to slim down.
+        import_root: The directory the files can be imported from. If given, the
+            import time of the modules is measured before and after slimming.
+        executor: The executor to use to slim the files in parallel, for example a
+            process pool. This can also be used to share a pool (and limit the
+            number of processes) between many calls. It is not shut down.
+
+    Returns:
+        The combined result of slimming all the files.
+    """
+    paths = list(paths)
+    result = SlimResult()
+    if not paths:
+        return result
+
+    import_time_before = None
+    if import_root is not None:
+        import_time_before = measure_import_time(paths, import_root)
+
+    file_results: Iterable[SlimResult] = (
+        map(slim_file, paths) if executor is None else executor.map(slim_file, paths)
+    )
+    for file_result in file_results:
+        result += file_result
+
+    if import_root is not None:
+        result = dataclasses.replace(
+            result,
+            import_time_before=import_time_before,
+            import_time_after=measure_import_time(paths, import_root),
+        )
+
+    return result
+
+
+def measure_import_time(paths: Iterable[str], import_root: str) -> float | None:
+    """Measure the time needed to import Python modules, in a subprocess.
+
+    The bytecode is compiled (to a temporary cache directory) before measuring, so
+    the measured time is the time spent loading the bytecode and executing the
+    modules, like when importing an installed wheel. The measurement is repeated a
+    few times and the minimum is returned.
+
+    Args:
+        paths: The paths of the files of the modules to import.
+        import_root: The directory the modules are imported from.
+
+    Returns:
+        The time needed to import all the modules, in seconds, or `None` if the
+            modules couldn't be imported.
+    """
+    modules = sorted(filter(None, (_module_name(path, import_root) for path in paths)))
+    if not modules:
+        return None
+
+    with tempfile.TemporaryDirectory() as pycache_prefix:
+        command = [sys.executable, "-c", _IMPORT_TIME_SCRIPT, pycache_prefix, *modules]
+        times: list[float] = []
+        # The first run only populates the bytecode cache
+        for _ in range(_IMPORT_TIME_RUNS + 1):
+            process = subprocess.run(
+                command, cwd=import_root, capture_output=True, text=True, check=False
+            )
+            if process.returncode != 0:
+                _logger.debug(
+                    "can't measure the import time of the generated modules: %s",
+                    process.stderr.strip(),
+                )
+                return None
+            times.append(float(process.stdout))
+
+    return min(times[1:])
+
+
+def _module_name(path: str, import_root: str) -> str | None:
+    """Get the name of the module in a Python file, if it is a module."""
+    relative, ext = os.path.splitext(os.path.relpath(path, import_root))
+    if ext != ".py":
+        return None
+    parts = relative.split(os.sep)
+    if parts[-1] == "__init__":
+        parts.pop()
+    if not parts or not all(part.isidentifier() for part in parts):
+        return None
+    return ".".join(parts)
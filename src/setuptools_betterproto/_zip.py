@@ -0,0 +1,102 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Packing of the generated Python files into a single zip archive.
+
+Big proto trees produce deep package hierarchies with many small files, which are
+slow to install, extract and import (specially on network filesystems). The
+generated files can instead be packed into a single zip archive, which can be
+imported via `zipimport` by adding it to `sys.path`.
+
+The archive contains both the sources and the precompiled bytecode (as unchecked
+hash-based `.pyc` files, so no timestamps need to be checked when importing). If the
+bytecode was compiled for a different Python version, the sources are used instead.
+"""
+
+import dataclasses
+import os
+import py_compile
+import tempfile
+import zipfile
+from collections.abc import Iterable
+
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+"""The date and time used for all the archive entries, for reproducibility."""
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class ZipResult:
+    """The result of packing files into a zip archive."""
+
+    archive: str
+    """The path of the archive."""
+
+    files: int
+    """The number of Python files packed."""
+
+    bytes_before: int
+    """The total size of the Python files packed, in bytes."""
+
+    bytes_after: int
+    """The size of the archive, in bytes."""
+
+
+def pack_files(files: Iterable[str], root: str, archive: str) -> ZipResult:
+    """Pack Python files into a zip archive, together with their bytecode.
+
+    The files are stored in the archive with their path relative to `root`, so the
+    archive can be added to `sys.path` in place of `root`. The archive is replaced
+    atomically if it already exists.
+
+    Args:
+        files: The paths of the Python files to pack.
+        root: The directory the paths in the archive are relative to.
+        archive: The path of the archive to create.
+
+    Returns:
+        The result of packing the files.
+    """
+    paths = sorted(files)
+    bytes_before = 0
+    archive_dir = os.path.dirname(archive) or "."
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # Write to a temporary file first, so the archive is replaced atomically
+    tmp_archive = archive + ".tmp"
+    with (
+        tempfile.TemporaryDirectory() as tmp_dir,
+        zipfile.ZipFile(tmp_archive, "w", zipfile.ZIP_DEFLATED) as zip_file,
+    ):
+        tmp_pyc = os.path.join(tmp_dir, "module.pyc")
+        for path in paths:
+            arcname = os.path.relpath(path, root).replace(os.sep, "/")
+            bytes_before += os.path.getsize(path)
+            _write(zip_file, arcname, _read(path))
+            py_compile.compile(
+                path,
+                cfile=tmp_pyc,
+                dfile=os.path.join(archive, arcname),
+                doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+            )
+            _write(zip_file, arcname + "c", _read(tmp_pyc))
+    os.replace(tmp_archive, archive)
+
+    return ZipResult(
+        archive=archive,
+        files=len(paths),
+        bytes_before=bytes_before,
+        bytes_after=os.path.getsize(archive),
+    )
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _write(zip_file: zipfile.ZipFile, arcname: str, data: bytes) -> None:
+    info = zipfile.ZipInfo(arcname, date_time=_ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    zip_file.writestr(info, data)
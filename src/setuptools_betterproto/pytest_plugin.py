@@ -0,0 +1,204 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Pytest plugin to compile the protobuf files once per test session.
+
+This plugin reads the `ProtobufConfig` from the project's `pyproject.toml` file,
+compiles the protobuf files into the pytest cache directory and adds the generated
+files to `sys.path`, so tests can import the generated code without committing it
+or compiling it in every CI job.
+
+The compilation is done only once per session, even when using `pytest-xdist`: all
+workers coordinate through a file lock, and only the first one runs the compiler
+(the controller process doesn't compile, as it doesn't run any tests). The generated
+files are reused between runs as long as the fingerprint of the proto files and
+configuration doesn't change. Nothing is compiled when only showing the help or the
+version.
+
+The plugin is not enabled automatically, it needs to be enabled explicitly, for
+example in the `conftest.py` file:
+
+```python
+pytest_plugins = ["setuptools_betterproto.pytest_plugin"]
+```
+
+Or via the command line with `-p setuptools_betterproto.pytest_plugin`.
+
+The generated code is added to `sys.path` before the tests are collected, so it can
+be imported at module level. The `betterproto_compiled` fixture can be used to get
+the result of the compilation.
+"""
+
+import contextlib
+import dataclasses
+import os
+import shutil
+import sys
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from . import _compile, _config, _manifest
+
+_RESULT_KEY = pytest.StashKey[_compile.CompileResult]()
+"""The key to store the compilation result in the pytest config stash."""
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the plugin options.
+
+    Args:
+        parser: The pytest parser.
+    """
+    parser.addini(
+        "betterproto_pyproject_toml",
+        "path of the pyproject.toml file to read the protobuf configuration from, "
+        "relative to the root directory",
+        default="pyproject.toml",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Compile the protobuf files and add the generated files to `sys.path`.
+
+    Args:
+        config: The pytest config.
+
+    Raises:
+        pytest.UsageError: If the `cacheprovider` plugin is disabled, as the
+            generated files are stored in the pytest cache.
+    """
+    if not _should_compile(config):
+        return
+    # The attribute is only set by the cacheprovider plugin
+    cache: pytest.Cache | None = getattr(config, "cache", None)
+    if cache is None:
+        raise pytest.UsageError(
+            "setuptools_betterproto.pytest_plugin stores the generated files in the "
+            "pytest cache, it can't be used with the cacheprovider plugin disabled "
+            "(-p no:cacheprovider)"
+        )
+
+    pyproject_toml = os.path.join(
+        config.rootpath, config.getini("betterproto_pyproject_toml")
+    )
+    cache_dir = str(cache.mkdir("setuptools_betterproto"))
+
+    # The paths in the configuration are relative to the pyproject.toml file
+    protobuf_config = dataclasses.replace(
+        _config.ProtobufConfig.from_pyproject_toml(pyproject_toml).with_root(
+            os.path.dirname(pyproject_toml)
+        ),
+        out_path=os.path.join(cache_dir, "out"),
+    )
+
+    with _file_lock(os.path.join(cache_dir, "lock")):
+        result = compile_cached(protobuf_config, cache_dir)
+
+    config.stash[_RESULT_KEY] = result
+    import_path = protobuf_config.out_path
+    if protobuf_config.zip_output:
+        import_path = os.path.join(import_path, protobuf_config.zip_output)
+    if import_path not in sys.path:
+        sys.path.insert(0, import_path)
+
+
+@pytest.fixture(scope="session")
+def betterproto_compiled(pytestconfig: pytest.Config) -> _compile.CompileResult:
+    """Get the result of compiling the protobuf files for this session.
+
+    Args:
+        pytestconfig: The pytest config.
+
+    Returns:
+        The result of the compilation.
+    """
+    result = pytestconfig.stash.get(_RESULT_KEY, None)
+    if result is None:
+        pytest.fail("The protobuf files were not compiled in this process")
+    return result
+
+
+def compile_cached(
+    config: _config.ProtobufConfig, manifest_dir: str
+) -> _compile.CompileResult:
+    """Compile the protobuf files, reusing the generated files if still up to date.
+
+    If the generated files are not up to date, the `out_path` is cleared before
+    compiling, so no stale files are left behind.
+
+    This function should be called with a lock held if several processes can use
+    the same `out_path`.
+
+    Args:
+        config: The configuration to use.
+        manifest_dir: The directory where the manifest of the generated files is
+            stored.
+
+    Returns:
+        The result of the compilation.
+    """
+    manifest = _manifest.GeneratedManifest.load(manifest_dir)
+    if manifest is None or not manifest.is_up_to_date(config):
+        shutil.rmtree(config.out_path, ignore_errors=True)
+    os.makedirs(config.out_path, exist_ok=True)
+    return _compile.compile_protos(config, manifest_dir=manifest_dir)
+
+
+def _should_compile(config: pytest.Config) -> bool:
+    """Check if the protobuf files should be compiled in this process.
+
+    Args:
+        config: The pytest config.
+
+    Returns:
+        Whether the protobuf files should be compiled.
+    """
+    if getattr(config.option, "help", False) or getattr(config.option, "version", 0):
+        return False
+    # The pytest-xdist controller only distributes the tests to the workers
+    is_xdist_worker = hasattr(config, "workerinput")
+    if not is_xdist_worker and getattr(config.option, "dist", "no") != "no":
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on a file, blocking until it can be acquired.
+
+    Args:
+        path: The path of the lock file. It is created if it doesn't exist.
+
+    Yields:
+        Nothing, the lock is held while the context is active.
+    """
+    with open(path, "a+b") as lock_file:
+        if sys.platform == "win32":
+            import msvcrt  # pylint: disable=import-outside-toplevel
+
+            lock_file.seek(0)
+            # LK_LOCK only retries for 10 seconds, so retry until it succeeds,
+            # backing off to avoid spinning while another process compiles
+            delay = 0.01
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(delay)
+                    delay = min(delay * 2, 1.0)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl  # pylint: disable=import-outside-toplevel
+
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,64 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Fixtures shared by the tests."""
+
+import dataclasses
+import sys
+from collections.abc import Iterator
+from unittest import mock
+
+import pytest
+
+from setuptools_betterproto import ProtobufConfig
+
+
+@dataclasses.dataclass(kw_only=True)
+class FakeProtoc:
+    """A fake protobuf compiler, generating some fixed files."""
+
+    files: dict[str, str] = dataclasses.field(
+        default_factory=lambda: {"pkg/__init__.py": ""}
+    )
+    """The files to generate, relative to the output directory, and their contents."""
+
+    code: str = "pass"
+    """Python code to run before generating the files (with `sys` and `time`)."""
+
+    protoc_command: mock.MagicMock = dataclasses.field(default_factory=mock.MagicMock)
+    """The mock replacing `protoc_command()`, to check how it was called."""
+
+    def command(self, config: ProtobufConfig, out_path: str) -> list[str]:
+        """Get a command that generates the files in `out_path`.
+
+        Args:
+            config: The configuration used to compile (the files to compile).
+            out_path: The directory where the files should be generated.
+
+        Returns:
+            The command to run.
+        """
+        del config  # Not needed, the files are always the same
+        return [
+            sys.executable,
+            "-c",
+            f"""\
+import pathlib, sys, time
+{self.code}
+for name, contents in {self.files!r}.items():
+    path = pathlib.Path({out_path!r}, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(contents)
+""",
+        ]
+
+
+@pytest.fixture
+def fake_protoc() -> Iterator[FakeProtoc]:
+    """Replace the protobuf compiler with a fake one while the test runs."""
+    fake = FakeProtoc()
+    with mock.patch(
+        "setuptools_betterproto._compile.protoc_command", side_effect=fake.command
+    ) as protoc_command:
+        fake.protoc_command = protoc_command
+        yield fake
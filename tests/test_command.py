@@ -3,13 +3,17 @@
 
 """Tests for the setuptools_betterproto package."""
 
+import pathlib
 import sys
 from unittest import mock
 
+import pytest
 from setuptools import Distribution
 from typing_extensions import override
 
-from setuptools_betterproto import CompileBetterproto, ProtobufConfig
+from conftest import FakeProtoc
+from setuptools_betterproto import AddProtoFiles, CompileBetterproto, ProtobufConfig
+from setuptools_betterproto._manifest import MANIFEST_FILE_NAME, GeneratedManifest
 
 CONFIG = ProtobufConfig(
     proto_path="test_path",
@@ -19,6 +23,15 @@ CONFIG = ProtobufConfig(
 )
 
 
+@pytest.fixture
+def project(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    """Create a project with a proto file, and make it the working directory."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "proto").mkdir()
+    (tmp_path / "proto" / "test.proto").write_text("syntax = 'proto3';\n")
+    return tmp_path
+
+
 def create_command() -> CompileBetterproto:
     """Create a new instance of the command with a mocked distribution."""
     dist = mock.MagicMock(spec=Distribution)
@@ -26,6 +39,26 @@ def create_command() -> CompileBetterproto:
     return CompileBetterproto(dist)
 
 
+def create_build_command(
+    project: pathlib.Path,
+    config: ProtobufConfig,
+    *,
+    package_dir: dict[str, str] | None = None,
+    editable_mode: bool = False,
+) -> CompileBetterproto:
+    """Create a new instance of the command building the project to `build/`."""
+    command = CompileBetterproto(
+        Distribution(
+            {"package_dir": {"": "src"} if package_dir is None else package_dir}
+        )
+    )
+    command.editable_mode = editable_mode
+    command.build_lib = str(project / "build" / "lib")
+    command.build_base = str(project / "build")
+    command.config = config
+    return command
+
+
 def test_initialize_options() -> None:
     """Test the initialization of the command options."""
     command = create_command()
@@ -42,14 +75,27 @@ def test_initialize_options() -> None:
     assert command.out_path == CONFIG.out_path
 
 
-def test_run() -> None:
+def test_run(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
     """Test the initialization of the command options."""
+    monkeypatch.chdir(tmp_path)
+    for file in [
+        "test_include1",
+        "test_include2",
+        "test_path/proto1.test",
+        "test_path/proto2.test",
+    ]:
+        (tmp_path / file).parent.mkdir(exist_ok=True)
+        (tmp_path / file).write_text("")
+    (tmp_path / CONFIG.out_path).mkdir()
+    (tmp_path / "tmp_out").mkdir()
+
     command = create_command()
 
     command.proto_path = CONFIG.proto_path
     command.proto_glob = CONFIG.proto_glob
     command.include_paths = ",".join(CONFIG.include_paths)
     command.out_path = CONFIG.out_path
+    command.build_base = str(tmp_path / "build")
 
     class _FakeConfig(ProtobufConfig):
 
@@ -70,9 +116,15 @@ def test_run() -> None:
         out_path=CONFIG.out_path,
     )
 
-    with mock.patch(
-        "setuptools_betterproto._command.subprocess",
-    ) as subprocess_module:
+    with (
+        mock.patch(
+            "setuptools_betterproto._compile.subprocess",
+        ) as subprocess_module,
+        mock.patch(
+            "setuptools_betterproto._compile.tempfile.mkdtemp",
+            return_value=str(tmp_path / "tmp_out"),
+        ),
+    ):
         command.run()
 
     subprocess_module.run.assert_called_once_with(
@@ -83,9 +135,187 @@ def test_run() -> None:
             "-Itest_path",
             "-Itest_include1",
             "-Itest_include2",
-            "--python_betterproto_out=test_out",
+            f"--python_betterproto_out={tmp_path / 'tmp_out'}",
             "test_path/proto1.test",
             "test_path/proto2.test",
         ],
         check=True,
     )
+    assert not (tmp_path / CONFIG.out_path / MANIFEST_FILE_NAME).exists()
+    assert (
+        tmp_path / "build" / "setuptools_betterproto" / MANIFEST_FILE_NAME
+    ).is_file()
+
+
+def test_run_slim(project: pathlib.Path, fake_protoc: FakeProtoc) -> None:
+    """Test that only the files generated by protoc are slimmed."""
+    out_path = project / "src"
+    out_path.mkdir()
+    (out_path / "existing.py").write_text('"""Not generated."""\n', encoding="utf-8")
+    fake_protoc.files = {"generated.py": '"""Generated."""\nimport a\nimport a\n'}
+    command = create_build_command(
+        project, ProtobufConfig(proto_path="proto", out_path="src", slim=True)
+    )
+
+    command.run()
+
+    assert (out_path / "generated.py").read_text(encoding="utf-8") == "import a\n"
+    assert (out_path / "existing.py").read_text(
+        encoding="utf-8"
+    ) == '"""Not generated."""\n'
+
+
+def test_run_sdist_generated(project: pathlib.Path, fake_protoc: FakeProtoc) -> None:
+    """Test that a manifest is written and used to skip compilation."""
+    command = create_build_command(
+        project,
+        ProtobufConfig(proto_path="proto", out_path="src", sdist_generated=True),
+    )
+
+    command.run()
+    fake_protoc.protoc_command.assert_called_once()
+    assert (project / "src" / MANIFEST_FILE_NAME).is_file()
+
+    fake_protoc.protoc_command.reset_mock()
+    command.run()
+    fake_protoc.protoc_command.assert_not_called()
+
+    (project / "proto" / "test.proto").write_text("syntax = 'proto2';\n")
+    command.run()
+    fake_protoc.protoc_command.assert_called_once()
+
+
+def test_output_mapping(
+    project: pathlib.Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that the outputs are declared from the manifest and `package_dir`."""
+    command = create_build_command(
+        project,
+        ProtobufConfig(proto_path="proto", out_path="gen"),
+        package_dir={"": "src", "api": "gen/api"},
+    )
+
+    assert command.get_source_files() == [str(pathlib.Path("proto", "test.proto"))]
+    assert not command.get_outputs()
+    assert not command.get_output_mapping()
+
+    GeneratedManifest(
+        fingerprint="",
+        files=(
+            "api/__init__.py",
+            "api/v1/__init__.py",
+            "other/__init__.py",
+            "not-a-package/__init__.py",
+        ),
+    ).save(command.manifest_dir)
+
+    build_lib = project / "build" / "lib"
+    expected = {
+        str(build_lib / "api" / "__init__.py"): str(
+            pathlib.Path("gen", "api", "__init__.py")
+        ),
+        str(build_lib / "api" / "v1" / "__init__.py"): str(
+            pathlib.Path("gen", "api", "v1", "__init__.py")
+        ),
+    }
+    caplog.clear()
+    assert command.get_output_mapping() == expected
+    assert command.get_outputs() == list(expected)
+    # `gen/other` is not in the root package directory (`src`)
+    assert str(pathlib.Path("gen", "other", "__init__.py")) in caplog.text
+
+
+@pytest.mark.parametrize("editable_mode", [False, True])
+def test_run_copies_outputs(
+    project: pathlib.Path, fake_protoc: FakeProtoc, editable_mode: bool
+) -> None:
+    """Test that the generated files are copied to `build_lib` if not editable."""
+    fake_protoc.files = {"pkg/__init__.py": "VALUE = 1"}
+    command = create_build_command(
+        project,
+        ProtobufConfig(proto_path="proto", out_path="src"),
+        editable_mode=editable_mode,
+    )
+
+    command.run()
+
+    assert (project / "src" / "pkg" / "__init__.py").is_file()
+    output = project / "build" / "lib" / "pkg" / "__init__.py"
+    assert command.get_outputs() == [str(output)]
+    if editable_mode:
+        assert not output.exists()
+    else:
+        assert output.read_text() == "VALUE = 1"
+
+
+@pytest.mark.parametrize("editable_mode", [False, True])
+def test_run_zip_output(
+    project: pathlib.Path, fake_protoc: FakeProtoc, editable_mode: bool
+) -> None:
+    """Test that the archive and a `.pth` file are put in `build_lib`."""
+    fake_protoc.files = {"pkg/__init__.py": "VALUE = 1"}
+    command = create_build_command(
+        project,
+        ProtobufConfig(proto_path="proto", out_path="src", zip_output="generated.zip"),
+        editable_mode=editable_mode,
+    )
+
+    command.run()
+
+    build_lib = project / "build" / "lib"
+    if editable_mode:
+        # The archive is not used, the files are generated in place
+        assert (project / "src" / "pkg" / "__init__.py").is_file()
+        assert not (project / "src" / "generated.zip").exists()
+        assert command.get_outputs() == [str(build_lib / "pkg" / "__init__.py")]
+        assert not build_lib.exists()
+    else:
+        assert not (project / "src" / "pkg").exists()
+        assert command.get_output_mapping() == {
+            str(build_lib / "generated.zip"): str(pathlib.Path("src", "generated.zip"))
+        }
+        assert command.get_outputs() == [
+            str(build_lib / "generated.zip"),
+            str(build_lib / "generated.pth"),
+        ]
+        assert (build_lib / "generated.zip").is_file()
+        assert (build_lib / "generated.pth").read_text() == "generated.zip\n"
+
+
+def test_add_proto_files_sdist_generated(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, fake_protoc: FakeProtoc
+) -> None:
+    """Test that the files are compiled before copying them to the sdist directory.
+
+    With the default `proto_path` (the project root) the compiler would find the
+    copies too otherwise.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pyproject.toml").write_text(
+        '[tool.setuptools_betterproto]\nout_path = "src"\nsdist_generated = true\n'
+    )
+    (tmp_path / "greet.proto").write_text("syntax = 'proto3';\n")
+    compiled: list[list[str]] = []
+
+    def _command(config: ProtobufConfig, out_path: str) -> list[str]:
+        compiled.append(config.expanded_proto_files)
+        return fake_protoc.command(config, out_path)
+
+    fake_protoc.protoc_command.side_effect = _command
+    dist = Distribution(
+        {
+            "name": "p2",
+            "version": "0.1",
+            "cmdclass": {
+                "add_proto_files": AddProtoFiles,
+                "compile_betterproto": CompileBetterproto,
+            },
+        }
+    )
+
+    dist.run_command("add_proto_files")
+
+    assert compiled == [["greet.proto"]]
+    assert (tmp_path / "p2-0.1" / "greet.proto").is_file()
+    assert (tmp_path / "p2-0.1" / "src" / MANIFEST_FILE_NAME).is_file()
+    assert (tmp_path / "p2-0.1" / "src" / "pkg" / "__init__.py").is_file()
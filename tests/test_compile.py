@@ -0,0 +1,256 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Tests for the programmatic compilation API."""
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import logging
+import pathlib
+import subprocess
+import threading
+from typing import Any
+from unittest import mock
+
+import pytest
+
+from conftest import FakeProtoc
+from setuptools_betterproto import (
+    CompileResult,
+    ProtobufConfig,
+    _compile,
+    compile_protos,
+    compile_protos_async,
+)
+from setuptools_betterproto._manifest import MANIFEST_FILE_NAME
+
+
+@pytest.fixture
+def config(tmp_path: pathlib.Path, fake_protoc: FakeProtoc) -> ProtobufConfig:
+    """Create a configuration with a proto file in a temporary directory.
+
+    The files are compiled with the fake protobuf compiler.
+    """
+    del fake_protoc  # Only needed to patch the compiler
+    (tmp_path / "proto").mkdir()
+    (tmp_path / "proto" / "test.proto").write_text("syntax = 'proto3';\n")
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "existing.py").write_text("")
+    return ProtobufConfig(proto_path="proto", out_path="out").with_root(str(tmp_path))
+
+
+def test_with_root() -> None:
+    """Test making all the paths in the configuration relative to a root."""
+    config = ProtobufConfig(
+        proto_path="proto", include_paths=["include"], out_path="src"
+    ).with_root("root")
+
+    assert config.proto_path == str(pathlib.Path("root", "proto"))
+    assert config.include_paths == [str(pathlib.Path("root", "include"))]
+    assert config.out_path == str(pathlib.Path("root", "src"))
+
+
+def test_compile_protos(config: ProtobufConfig) -> None:
+    """Test compiling synchronously."""
+    result = compile_protos(config)
+
+    assert result.files == (str(pathlib.Path(config.out_path, "pkg", "__init__.py")),)
+    assert not result.cache_hit
+    assert result.slim is None
+    assert 0 < result.protoc_time <= result.total_time
+
+
+def test_compile_protos_cache_hit(
+    config: ProtobufConfig, tmp_path: pathlib.Path
+) -> None:
+    """Test that a second compilation is a cache hit if the inputs didn't change."""
+    manifest_dir = str(tmp_path / "manifest")
+    first = compile_protos(config, manifest_dir=manifest_dir)
+    second = compile_protos(config, manifest_dir=manifest_dir)
+
+    assert pathlib.Path(manifest_dir, MANIFEST_FILE_NAME).is_file()
+    assert not pathlib.Path(config.out_path, MANIFEST_FILE_NAME).exists()
+    assert not first.cache_hit
+    assert second.cache_hit
+    assert second.files == first.files
+    assert second.protoc_time == 0.0
+
+
+def test_compile_protos_no_manifest(
+    config: ProtobufConfig, fake_protoc: FakeProtoc
+) -> None:
+    """Test that no manifest is written and the files are always compiled."""
+    first = compile_protos(config)
+    second = compile_protos(config)
+
+    assert fake_protoc.protoc_command.call_count == 2
+    assert not first.cache_hit
+    assert not second.cache_hit
+    assert not pathlib.Path(config.out_path, MANIFEST_FILE_NAME).exists()
+
+
+def test_compile_protos_no_proto_files(tmp_path: pathlib.Path) -> None:
+    """Test compiling when there are no proto files."""
+    result = compile_protos(ProtobufConfig(proto_path=str(tmp_path)))
+
+    assert result.files == ()
+    assert not result.cache_hit
+
+
+async def test_compile_protos_async(
+    config: ProtobufConfig, tmp_path: pathlib.Path
+) -> None:
+    """Test compiling asynchronously with a concurrency limit.
+
+    As the compilations can't run concurrently, the second one is a cache hit.
+    """
+    semaphore = asyncio.Semaphore(1)
+    manifest_dir = str(tmp_path / "manifest")
+    results = await asyncio.gather(
+        compile_protos_async(config, semaphore=semaphore, manifest_dir=manifest_dir),
+        compile_protos_async(config, semaphore=semaphore, manifest_dir=manifest_dir),
+    )
+
+    for result in results:
+        assert result.files == (
+            str(pathlib.Path(config.out_path, "pkg", "__init__.py")),
+        )
+    assert [result.cache_hit for result in results] == [False, True]
+
+
+async def test_compile_protos_async_executor(config: ProtobufConfig) -> None:
+    """Test that the generated files are slimmed with the given executor."""
+    config = dataclasses.replace(config, slim=True)
+    with (
+        concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor,
+        mock.patch.object(executor, "map", wraps=executor.map) as map_mock,
+    ):
+        result = await compile_protos_async(config, executor=executor)
+
+    map_mock.assert_called_once()
+    assert result.slim is not None
+    assert result.slim.files == 1
+
+
+async def test_compile_protos_async_error(
+    config: ProtobufConfig, fake_protoc: FakeProtoc
+) -> None:
+    """Test that a failing compiler raises an error."""
+    fake_protoc.code = "sys.exit(3)"
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        await compile_protos_async(config)
+
+    assert exc_info.value.returncode == 3
+
+
+async def test_compile_protos_async_cancel(
+    config: ProtobufConfig, fake_protoc: FakeProtoc, tmp_path: pathlib.Path
+) -> None:
+    """Test that cancelling the compilation kills the compiler and cleans up."""
+    tmp_out = tmp_path / "tmp_out"
+    tmp_out.mkdir()
+    fake_protoc.code = "time.sleep(30)"
+    with mock.patch(
+        "setuptools_betterproto._compile.tempfile.mkdtemp",
+        return_value=str(tmp_out),
+    ):
+        task = asyncio.create_task(compile_protos_async(config))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, timeout=10)
+
+    assert not pathlib.Path(config.out_path, "pkg").exists()
+    assert not tmp_out.exists()
+
+
+async def test_compile_protos_async_cancel_finishing(
+    config: ProtobufConfig, tmp_path: pathlib.Path
+) -> None:
+    """Test that cancelling while processing the files waits for the processing."""
+    tmp_out = tmp_path / "tmp_out"
+    tmp_out.mkdir()
+    manifest_dir = str(tmp_path / "manifest")
+    started = threading.Event()
+    release = threading.Event()
+
+    def _finish(*args: Any) -> CompileResult:
+        started.set()
+        release.wait(10)
+        return real_finish(*args)
+
+    real_finish = _compile._finish
+    with (
+        mock.patch("setuptools_betterproto._compile._finish", side_effect=_finish),
+        mock.patch(
+            "setuptools_betterproto._compile.tempfile.mkdtemp",
+            return_value=str(tmp_out),
+        ),
+    ):
+        task = asyncio.create_task(
+            compile_protos_async(config, manifest_dir=manifest_dir)
+        )
+        assert await asyncio.to_thread(started.wait, 10)
+        task.cancel()
+        await asyncio.sleep(0.1)
+        # The temporary directory is still being used
+        assert tmp_out.exists()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(task, timeout=10)
+
+    assert not tmp_out.exists()
+    expected = (str(pathlib.Path(config.out_path, "pkg", "__init__.py")),)
+    result = await compile_protos_async(config, manifest_dir=manifest_dir)
+    assert result.cache_hit
+    assert result.files == expected
+
+
+@pytest.mark.parametrize("level", [logging.INFO, logging.DEBUG])
+def test_compile_protos_slim_import_time(
+    config: ProtobufConfig, caplog: pytest.LogCaptureFixture, level: int
+) -> None:
+    """Test that the import time is only measured with debug logging enabled."""
+    config = dataclasses.replace(config, slim=True)
+    caplog.set_level(level, logger="setuptools_betterproto._compile")
+    with mock.patch(
+        "setuptools_betterproto._slim.measure_import_time", return_value=0.5
+    ) as measure_import_time:
+        result = compile_protos(config)
+
+    assert result.slim is not None
+    assert "bytes saved" in caplog.text
+    if level == logging.DEBUG:
+        assert measure_import_time.call_count == 2
+        assert "import time saved by slimming: 0.0 ms" in caplog.text
+    else:
+        measure_import_time.assert_not_called()
+        assert result.slim.import_time_saved is None
+        assert "import time" not in caplog.text
+
+
+def test_compile_protos_zip_output(config: ProtobufConfig) -> None:
+    """Test that the generated files are packed into a zip archive."""
+    config = dataclasses.replace(config, zip_output="generated.zip")
+    result = compile_protos(config)
+
+    archive = pathlib.Path(config.out_path, "generated.zip")
+    assert result.files == (str(archive),)
+    assert result.zip is not None
+    assert result.zip.files == 1
+    assert archive.is_file()
+    assert not pathlib.Path(config.out_path, "pkg").exists()
+    assert pathlib.Path(config.out_path, "existing.py").exists()
+
+
+def test_compile_protos_only_generated_files(config: ProtobufConfig) -> None:
+    """Test that files in the `out_path` that were not generated are left alone."""
+    config = dataclasses.replace(config, slim=True)
+    existing = pathlib.Path(config.out_path, "existing.py")
+    existing.write_text('"""Not generated."""\n')
+    result = compile_protos(config)
+
+    assert result.slim is not None
+    assert result.slim.files == 1
+    assert existing.read_text() == '"""Not generated."""\n'
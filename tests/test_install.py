@@ -0,0 +1,53 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Tests for the setuptools hook entry-point."""
+
+import os
+from unittest import mock
+
+import pytest
+import setuptools.command.build as _build_command
+from setuptools import Distribution
+
+from setuptools_betterproto import ProtobufConfig
+from setuptools_betterproto._install import (
+    add_build_subcommand_compile_betterproto,
+    build_proto,
+    get_build_base,
+)
+
+
+def test_add_build_subcommand() -> None:
+    """Test that the command is added once, before `build_py`."""
+    sub_commands = [("build_py", None), ("build_ext", None)]
+    with mock.patch.object(_build_command.build, "sub_commands", sub_commands):
+        dist = Distribution()
+        add_build_subcommand_compile_betterproto(dist)
+        add_build_subcommand_compile_betterproto(dist)
+
+    assert sub_commands == [
+        ("compile_betterproto", None),
+        ("build_py", None),
+        ("build_ext", None),
+    ]
+
+
+@pytest.mark.parametrize(
+    "attrs, expected",
+    [
+        ({}, "build"),
+        ({"options": {"build": {"build_base": "custom"}}}, "custom"),
+    ],
+)
+def test_build_proto_build_base(attrs: dict[str, object], expected: str) -> None:
+    """Test that the manifest is stored in the build directory from `setup()`."""
+    config = ProtobufConfig()
+    with mock.patch(
+        "setuptools_betterproto._install._compile.compile_protos"
+    ) as compile_protos:
+        build_proto(config, build_base=get_build_base(Distribution(attrs)))
+
+    compile_protos.assert_called_once_with(
+        config, manifest_dir=os.path.join(expected, "setuptools_betterproto")
+    )
@@ -0,0 +1,111 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Tests for the manifest of generated files."""
+
+import dataclasses
+import logging
+import pathlib
+
+import pytest
+
+from setuptools_betterproto import ProtobufConfig
+from setuptools_betterproto._manifest import (
+    MANIFEST_FILE_NAME,
+    GeneratedManifest,
+    compute_fingerprint,
+)
+
+
+@pytest.fixture
+def config(tmp_path: pathlib.Path) -> ProtobufConfig:
+    """Create a configuration with some proto files in a temporary directory."""
+    (tmp_path / "proto" / "sub").mkdir(parents=True)
+    (tmp_path / "proto" / "a.proto").write_text("syntax = 'proto3';\n")
+    (tmp_path / "proto" / "sub" / "b.proto").write_text("syntax = 'proto3';\n")
+    (tmp_path / "include").mkdir()
+    (tmp_path / "include" / "c.proto").write_text("syntax = 'proto3';\n")
+    (tmp_path / "out" / "pkg").mkdir(parents=True)
+    (tmp_path / "out" / "pkg" / "__init__.py").write_text("")
+    return ProtobufConfig(
+        proto_path=str(tmp_path / "proto"),
+        include_paths=[str(tmp_path / "include")],
+        out_path=str(tmp_path / "out"),
+    )
+
+
+def test_fingerprint_stable(config: ProtobufConfig) -> None:
+    """Test that the fingerprint doesn't change if the inputs don't change."""
+    assert compute_fingerprint(config) == compute_fingerprint(config)
+
+
+def test_fingerprint_changes(config: ProtobufConfig) -> None:
+    """Test that the fingerprint changes when the inputs change."""
+    fingerprint = compute_fingerprint(config)
+
+    assert compute_fingerprint(dataclasses.replace(config, slim=True)) != fingerprint
+
+    pathlib.Path(config.include_paths[0], "c.proto").write_text("syntax = 'proto2';\n")
+    assert compute_fingerprint(config) != fingerprint
+
+
+def test_fingerprint_relative_paths(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the fingerprint doesn't depend on how and where paths are given."""
+    for root in ["a", "b"]:
+        (tmp_path / root / "proto" / "sub").mkdir(parents=True)
+        (tmp_path / root / "proto" / "sub" / "x.proto").write_text("syntax = 'proto3';")
+    monkeypatch.chdir(tmp_path / "a")
+
+    fingerprints = {
+        compute_fingerprint(ProtobufConfig(proto_path="proto")),
+        compute_fingerprint(ProtobufConfig(proto_path="./proto")),
+        compute_fingerprint(ProtobufConfig(proto_path="proto", out_path="other")),
+        compute_fingerprint(
+            ProtobufConfig(proto_path="proto").with_root(str(tmp_path / "b"))
+        ),
+    }
+    assert len(fingerprints) == 1
+
+    # Moving a file to another directory changes the fingerprint
+    (tmp_path / "b" / "proto" / "sub" / "x.proto").rename(
+        tmp_path / "b" / "proto" / "x.proto"
+    )
+    assert (
+        compute_fingerprint(
+            ProtobufConfig(proto_path="proto").with_root(str(tmp_path / "b"))
+        )
+        not in fingerprints
+    )
+
+
+def test_save_load(config: ProtobufConfig) -> None:
+    """Test saving and loading the manifest."""
+    manifest = GeneratedManifest(
+        fingerprint=compute_fingerprint(config), files=("pkg/__init__.py",)
+    )
+    manifest.save(config.out_path)
+
+    assert pathlib.Path(config.out_path, MANIFEST_FILE_NAME).is_file()
+    loaded = GeneratedManifest.load(config.out_path)
+    assert loaded is not None
+    assert loaded == manifest
+    assert loaded.is_up_to_date(config)
+
+    pathlib.Path(config.out_path, "pkg", "__init__.py").unlink()
+    assert not loaded.is_up_to_date(config)
+
+
+def test_load_missing(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Test loading a manifest that doesn't exist."""
+    assert GeneratedManifest.load(str(tmp_path)) is None
+    assert caplog.record_tuples == []
+
+
+def test_load_invalid(tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Test loading an invalid manifest."""
+    (tmp_path / MANIFEST_FILE_NAME).write_text('{"version": 1000}')
+
+    assert GeneratedManifest.load(str(tmp_path)) is None
+    assert [level for _, level, _ in caplog.record_tuples] == [logging.WARNING]
@@ -0,0 +1,179 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Tests for the pytest plugin."""
+
+import os
+import pathlib
+import subprocess
+import sys
+import types
+
+import pytest
+
+import setuptools_betterproto
+from conftest import FakeProtoc
+from setuptools_betterproto.pytest_plugin import _should_compile
+
+pytest_plugins = ["pytester"]
+
+TEST_FILE = """
+import gen_pkg
+
+def test_generated(betterproto_compiled):
+    assert gen_pkg.VALUE == 42
+    assert gen_pkg.__file__ in betterproto_compiled.files
+"""
+
+
+COMPILE_SCRIPT = """
+import os, pathlib, sys
+from unittest import mock
+
+from setuptools_betterproto import ProtobufConfig
+from setuptools_betterproto.pytest_plugin import _file_lock, compile_cached
+
+cache_dir = sys.argv[1]
+runs_dir = pathlib.Path(cache_dir, "runs")
+
+
+def fake_protoc(_config, out_path):
+    return [
+        sys.executable,
+        "-c",
+        "import pathlib, time; "
+        f"pathlib.Path({str(runs_dir)!r}, str({os.getpid()})).touch(); "
+        "time.sleep(0.5); "
+        f"p = pathlib.Path({out_path!r}, 'gen_pkg'); "
+        "p.mkdir(); "
+        "(p / '__init__.py').write_text('VALUE = 42')",
+    ]
+
+
+config = ProtobufConfig(
+    proto_path=os.path.join(cache_dir, "proto"),
+    out_path=os.path.join(cache_dir, "out"),
+)
+with mock.patch(
+    "setuptools_betterproto._compile.protoc_command", side_effect=fake_protoc
+):
+    with _file_lock(os.path.join(cache_dir, "lock")):
+        result = compile_cached(config, cache_dir)
+print(result.cache_hit)
+"""
+
+
+def create_project(pytester: pytest.Pytester) -> None:
+    """Create a project with a proto file configured in the `pyproject.toml`."""
+    pytester.makepyprojecttoml(
+        """
+[tool.setuptools_betterproto]
+proto_path = "proto"
+"""
+    )
+    pytester.mkdir("proto")
+    pytester.path.joinpath("proto", "test.proto").write_text("syntax = 'proto3';\n")
+
+
+def test_compile_cached_multiprocess(tmp_path: pathlib.Path) -> None:
+    """Test that concurrent processes sharing a cache compile only once."""
+    (tmp_path / "proto").mkdir()
+    (tmp_path / "proto" / "test.proto").write_text("syntax = 'proto3';\n")
+    (tmp_path / "runs").mkdir()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            [
+                os.path.dirname(os.path.dirname(setuptools_betterproto.__file__)),
+                os.environ.get("PYTHONPATH", ""),
+            ]
+        ),
+    }
+
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", COMPILE_SCRIPT, str(tmp_path)],
+            env=env,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(4)
+    ]
+    outputs = [process.communicate(timeout=60)[0].strip() for process in processes]
+
+    assert [process.returncode for process in processes] == [0] * 4
+    assert sorted(outputs) == ["False", "True", "True", "True"]
+    assert len(list((tmp_path / "runs").iterdir())) == 1
+    assert (tmp_path / "out" / "gen_pkg" / "__init__.py").is_file()
+
+
+@pytest.mark.parametrize(
+    "option, dist, worker, expected",
+    [
+        ({}, "no", False, True),
+        ({"help": True}, "no", False, False),
+        ({"version": 1}, "no", False, False),
+        ({}, "load", False, False),
+        ({}, "load", True, True),
+    ],
+)
+def test_should_compile(
+    option: dict[str, object], dist: str, worker: bool, expected: bool
+) -> None:
+    """Test that nothing is compiled for help, version and the xdist controller."""
+    config = types.SimpleNamespace(
+        option=types.SimpleNamespace(
+            **{"help": False, "version": 0, "dist": dist, **option}
+        )
+    )
+    if worker:
+        config.workerinput = {"workerid": "gw0"}
+
+    assert _should_compile(config) is expected  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize("arg", ["--help", "--version"])
+def test_plugin_help(
+    pytester: pytest.Pytester, fake_protoc: FakeProtoc, arg: str
+) -> None:
+    """Test that nothing is compiled when only showing the help or version."""
+    create_project(pytester)
+
+    result = pytester.runpytest_inprocess(
+        "-p", "setuptools_betterproto.pytest_plugin", arg
+    )
+
+    assert result.ret == 0
+    fake_protoc.protoc_command.assert_not_called()
+
+
+def test_plugin(pytester: pytest.Pytester, fake_protoc: FakeProtoc) -> None:
+    """Test that the files are compiled once and reused between runs."""
+    create_project(pytester)
+    pytester.makepyfile(TEST_FILE)
+
+    fake_protoc.files = {"gen_pkg/__init__.py": "VALUE = 42"}
+    args = ["-p", "setuptools_betterproto.pytest_plugin"]
+    pytester.runpytest_inprocess(*args).assert_outcomes(passed=1)
+    pytester.runpytest_inprocess(*args).assert_outcomes(passed=1)
+    fake_protoc.protoc_command.assert_called_once()
+
+    # Changing the proto files invalidates the cache
+    pytester.path.joinpath("proto", "test.proto").write_text("syntax = 'proto2';")
+    pytester.runpytest_inprocess(*args).assert_outcomes(passed=1)
+    assert fake_protoc.protoc_command.call_count == 2
+
+
+def test_plugin_no_cacheprovider(
+    pytester: pytest.Pytester, fake_protoc: FakeProtoc
+) -> None:
+    """Test that a clear error is shown if the cache provider is disabled."""
+    create_project(pytester)
+
+    result = pytester.runpytest_inprocess(
+        "-p", "setuptools_betterproto.pytest_plugin", "-p", "no:cacheprovider"
+    )
+
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(["*-p no:cacheprovider*"])
+    fake_protoc.protoc_command.assert_not_called()
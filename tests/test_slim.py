@@ -0,0 +1,161 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Tests for the slim post-generation transform."""
+
+import concurrent.futures
+import pathlib
+from unittest import mock
+
+from setuptools_betterproto._slim import SlimResult, slim_files, slim_source
+
+HEADER = """\
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# sources: test.proto
+# plugin: python-betterproto
+# This file has been @generated
+"""
+
+SOURCE = (
+    HEADER
+    + '''
+"""Module docstring."""
+from dataclasses import dataclass
+from typing import List
+
+import betterproto
+from typing import List
+
+
+@dataclass(eq=False, repr=False)
+class Message(betterproto.Message):
+    """A message."""
+
+    value: int = betterproto.int32_field(1)
+    """A field."""
+
+    values: List[int] = betterproto.int32_field(2)
+
+
+class Empty(betterproto.Message):
+    """An empty message."""
+
+
+def function() -> int:
+    """A function."""
+    return 42  # The answer
+'''
+)
+
+
+def test_slim_source() -> None:
+    """Test that docstrings, comments and repeated imports are removed."""
+    slimmed = slim_source(SOURCE)
+
+    assert slimmed.startswith(HEADER + "from dataclasses import dataclass\n")
+    assert '"""' not in slimmed
+    assert "#" not in slimmed[len(HEADER) :]
+    assert slimmed.count("from typing import List") == 1
+    assert len(slimmed) < len(SOURCE)
+    assert "class Empty(betterproto.Message):\n    pass\n" in slimmed
+
+
+def test_slim_source_behavior() -> None:
+    """Test that the slimmed code behaves like the original."""
+    source = 'def function() -> int:\n    """A function."""\n    return 42  # answer\n'
+    namespace: dict[str, object] = {}
+    code = compile(slim_source(source), "<test>", "exec")
+    exec(code, namespace)  # pylint: disable=exec-used
+
+    function = namespace["function"]
+    assert callable(function)
+    assert function() == 42
+    assert function.__doc__ is None
+
+
+def test_slim_source_empty_bodies() -> None:
+    """Test that bodies left empty are filled with `pass`."""
+    slimmed = slim_source('class A:\n    """Doc."""\n\nif True:\n    "doc"\n')
+
+    assert slimmed == "class A:\n    pass\nif True:\n    pass\n"
+
+
+def test_slim_files(tmp_path: pathlib.Path) -> None:
+    """Test slimming several files in place."""
+    paths = [tmp_path / "a.py", tmp_path / "b.py"]
+    for path in paths:
+        path.write_text(SOURCE, encoding="utf-8")
+
+    result = slim_files(map(str, paths))
+
+    assert result.files == 2
+    assert result.bytes_before == 2 * len(SOURCE.encode("utf-8"))
+    assert result.bytes_after == sum(len(p.read_bytes()) for p in paths)
+    assert result.bytes_saved > 0
+    for path in paths:
+        assert path.read_text(encoding="utf-8") == slim_source(SOURCE)
+
+
+def test_slim_files_no_pool(tmp_path: pathlib.Path) -> None:
+    """Test that no process pool is started if no executor is given."""
+    paths = [tmp_path / "a.py", tmp_path / "b.py"]
+    for path in paths:
+        path.write_text(SOURCE, encoding="utf-8")
+
+    with mock.patch("concurrent.futures.ProcessPoolExecutor") as pool_class:
+        result = slim_files(map(str, paths))
+
+    assert result.files == 2
+    pool_class.assert_not_called()
+    for path in paths:
+        assert path.read_text(encoding="utf-8") == slim_source(SOURCE)
+
+
+def test_slim_files_executor(tmp_path: pathlib.Path) -> None:
+    """Test slimming files with an executor provided by the caller."""
+    paths = [tmp_path / "a.py", tmp_path / "b.py", tmp_path / "c.py"]
+    for path in paths:
+        path.write_text(SOURCE, encoding="utf-8")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        with mock.patch.object(executor, "map", wraps=executor.map) as map_mock:
+            result = slim_files(map(str, paths), executor=executor)
+        map_mock.assert_called_once()
+        # The executor is not shut down, so it can be reused
+        assert executor.submit(lambda: 42).result() == 42
+
+    assert result.files == 3
+    for path in paths:
+        assert path.read_text(encoding="utf-8") == slim_source(SOURCE)
+
+
+def test_slim_files_import_time(tmp_path: pathlib.Path) -> None:
+    """Test that the import time is measured when an import root is given."""
+    package = tmp_path / "slim_pkg"
+    package.mkdir()
+    paths = [package / "__init__.py", package / "sub.py"]
+    for path in paths:
+        path.write_text('"""Doc."""\nVALUE = 42\n', encoding="utf-8")
+
+    result = slim_files(map(str, paths), import_root=str(tmp_path))
+
+    assert result.import_time_before is not None
+    assert result.import_time_after is not None
+    assert result.import_time_saved is not None
+    assert not list(tmp_path.rglob("__pycache__"))
+
+
+def test_slim_files_import_time_error(tmp_path: pathlib.Path) -> None:
+    """Test that the import time is unknown if the modules can't be imported."""
+    path = tmp_path / "broken_module.py"
+    path.write_text("import does_not_exist\n", encoding="utf-8")
+
+    result = slim_files([str(path)], import_root=str(tmp_path))
+
+    assert result.files == 1
+    assert result.import_time_saved is None
+
+
+def test_slim_files_empty() -> None:
+    """Test slimming no files at all."""
+    assert slim_files([]) == SlimResult()
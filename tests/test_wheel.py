@@ -0,0 +1,132 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""End-to-end tests building wheels of a project using the plugin."""
+
+import importlib.metadata
+import importlib.util
+import pathlib
+import subprocess
+import sys
+import textwrap
+import zipfile
+
+import pytest
+
+PROTO = """\
+syntax = "proto3";
+
+package wheel_test_api.v1;
+
+// A greeting.
+message Greeting {
+  // The text of the greeting.
+  string text = 1;
+}
+"""
+
+
+def _can_build() -> bool:
+    """Check if the tools needed to build a project with proto files are available."""
+    if any(
+        importlib.util.find_spec(name) is None
+        for name in ("grpc_tools", "betterproto", "setuptools_betterproto")
+    ):
+        return False
+    return any(
+        entry_point.name == "compile_betterproto"
+        for entry_point in importlib.metadata.entry_points(group="distutils.commands")
+    )
+
+
+pytestmark = pytest.mark.skipif(
+    not _can_build(),
+    reason="needs grpcio-tools, betterproto and setuptools-betterproto installed",
+)
+
+
+def _build_wheel(project: pathlib.Path, dist: pathlib.Path) -> pathlib.Path:
+    """Build a wheel of a project, using the installed plugin."""
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pip",
+            "wheel",
+            "--quiet",
+            "--no-build-isolation",
+            "--no-deps",
+            "--wheel-dir",
+            str(dist),
+            str(project),
+        ],
+        check=True,
+    )
+    (wheel,) = dist.glob("*.whl")
+    return wheel
+
+
+def test_zip_output_wheel(tmp_path: pathlib.Path) -> None:
+    """Test that the zip archive in a wheel is importable once installed."""
+    project = tmp_path / "project"
+    (project / "proto").mkdir(parents=True)
+    (project / "proto" / "greeting.proto").write_text(PROTO)
+    (project / "src" / "wheel_test").mkdir(parents=True)
+    (project / "src" / "wheel_test" / "__init__.py").write_text("")
+    (project / "pyproject.toml").write_text(
+        textwrap.dedent(
+            """\
+            [build-system]
+            requires = ["setuptools", "setuptools-betterproto"]
+            build-backend = "setuptools.build_meta"
+
+            [project]
+            name = "wheel-test"
+            version = "0.1"
+
+            [tool.setuptools_betterproto]
+            proto_path = "proto"
+            out_path = "src"
+            zip_output = "wheel_test_generated.zip"
+            """
+        )
+    )
+
+    wheel = _build_wheel(project, tmp_path / "dist")
+
+    with zipfile.ZipFile(wheel) as wheel_zip:
+        names = wheel_zip.namelist()
+        assert "wheel_test_generated.zip" in names
+        assert "wheel_test_generated.pth" in names
+        assert not [name for name in names if name.startswith("wheel_test_api/")]
+        assert (
+            wheel_zip.read("wheel_test_generated.pth") == b"wheel_test_generated.zip\n"
+        )
+        # Install the wheel by extracting it to a site directory
+        site_dir = tmp_path / "site-packages"
+        wheel_zip.extractall(site_dir)
+
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import site; site.addsitedir({str(site_dir)!r}); "
+            "from wheel_test_api.v1 import Greeting; "
+            "print(Greeting(text='hello').text, Greeting.__module__); "
+            "import wheel_test_api; print(wheel_test_api.__file__)",
+        ],
+        cwd=tmp_path,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+
+    assert output[:2] == ["hello", "wheel_test_api.v1"]
+    assert output[2].startswith(str(site_dir / "wheel_test_generated.zip"))
+    # No generated files or manifest are left in the project
+    assert not (project / "src" / "wheel_test_api").exists()
+    assert not [
+        path
+        for path in project.rglob(".setuptools_betterproto.json")
+        if "build" not in path.relative_to(project).parts
+    ]
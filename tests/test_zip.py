@@ -0,0 +1,72 @@
+# License: MIT
+# Copyright © 2024 Frequenz Energy-as-a-Service GmbH
+
+"""Tests for packing the generated files into a zip archive."""
+
+import pathlib
+import subprocess
+import sys
+import zipfile
+
+from setuptools_betterproto._zip import pack_files
+
+
+def _create_tree(root: pathlib.Path) -> list[str]:
+    """Create a small package tree like the ones generated by betterproto."""
+    files = {
+        "zipped_pkg/__init__.py": "",
+        "zipped_pkg/api/__init__.py": "from .v1 import VALUE\n",
+        "zipped_pkg/api/v1/__init__.py": "VALUE = 42\n",
+    }
+    for name, contents in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents)
+    return [str(root / name) for name in files]
+
+
+def test_pack_files(tmp_path: pathlib.Path) -> None:
+    """Test that the archive contains the sources and bytecode, and is importable."""
+    out_path = tmp_path / "out"
+    files = _create_tree(out_path)
+    archive = out_path / "generated.zip"
+
+    result = pack_files(files, str(out_path), str(archive))
+
+    assert result.files == 3
+    assert result.bytes_after == archive.stat().st_size
+    with zipfile.ZipFile(archive) as zip_file:
+        assert sorted(zip_file.namelist()) == [
+            "zipped_pkg/__init__.py",
+            "zipped_pkg/__init__.pyc",
+            "zipped_pkg/api/__init__.py",
+            "zipped_pkg/api/__init__.pyc",
+            "zipped_pkg/api/v1/__init__.py",
+            "zipped_pkg/api/v1/__init__.pyc",
+        ]
+
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import zipped_pkg.api; print(zipped_pkg.api.VALUE, zipped_pkg.__file__)",
+        ],
+        env={"PYTHONPATH": str(archive)},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    assert output[0] == "42"
+    assert output[1].startswith(str(archive))
+
+
+def test_pack_files_reproducible(tmp_path: pathlib.Path) -> None:
+    """Test that packing the same files twice produces the same archive."""
+    files = _create_tree(tmp_path)
+    archive = tmp_path / "generated.zip"
+
+    pack_files(files, str(tmp_path), str(archive))
+    first = archive.read_bytes()
+    pack_files(files, str(tmp_path), str(archive))
+
+    assert archive.read_bytes() == first